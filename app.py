@@ -3,48 +3,158 @@ import pandas as pd
 import time
 import json
 import os
+import sys
+import io
+import hashlib
 from pathlib import Path
 
-from src.processors.gemini_classifier import GeminiClassifier
+from src.cache.llm_cache import get_cache
+from src.utils.json_parser import load_json_file
 import subprocess
+import threading
+import queue
+import collections
+import re
+import selectors
 
-def run_full_pipeline(input_file, output_dir="outputs", delay=1.0):
+# Subprocess log rendering: bounded buffer, throttled redraws
+LOG_BUFFER_LINES = 500
+LOG_VISIBLE_LINES = 200
+LOG_FLUSH_INTERVAL = 0.2  # seconds
+SUBPROCESS_READ_SIZE = 65536  # bytes per os.read() on the child's stdout
+# Results rendering: final_results.csv is scanned in chunks, only a preview is displayed
+RESULTS_CHUNK_ROWS = 2000
+RESULTS_PREVIEW_ROWS = 1000
+RESULT_CLASS_COL = "Final Classification"  # column name written by finalize_results
+# Lines that mark a finished pipeline stage. MULTILINE + non-greedy prefix => at most one
+# match per line, so one findall over a drained block counts finished-stage lines.
+_STAGE_DONE_RE = re.compile(r"^.*?(?:done|complete|finished|success|[✓✗√x])", re.IGNORECASE | re.MULTILINE)
+
+def run_full_pipeline(input_csv: bytes, output_dir="outputs", delay=1.0, batch_size=None, use_subprocess=False):
+    """
+    Run the full compliance pipeline from the Streamlit app.
+    Stages run in-process on a background thread and report structured progress events;
+    `use_subprocess=True` falls back to launching start_pipeline as a child process.
+    """
+    if use_subprocess:
+        return _run_pipeline_subprocess(input_csv, output_dir, delay, batch_size)
+
+    from src.pipelines.start_pipeline import run_pipeline
+
+    output_area = st.empty()
+    progress_bar = st.progress(0)
+    events: queue.Queue = queue.Queue()
+    outcome = {}
+
+    def _worker():
+        try:
+            # the raw bytes go to the streaming prescan (block-wise parse of the two input columns)
+            outcome["final_csv"] = run_pipeline(
+                input_csv,
+                outdir=output_dir,
+                llm_min_interval=delay,
+                batch_size=batch_size,
+                progress_cb=events.put,
+            )
+        except Exception as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=_worker, daemon=True)
+    worker.start()
+    log_lines = []
+    while worker.is_alive() or not events.empty():
+        try:
+            ev = events.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        verb = "started" if ev["status"] == "start" else "done"
+        log_lines.append(f"[{ev['index']}/{ev['total']}] {ev['stage']} {verb}")
+        output_area.text_area("Pipeline Output", "\n".join(log_lines), height=200)
+        progress_bar.progress(min(ev["pct"], 1.0))
+    worker.join()
+
+    if "error" in outcome:
+        st.error(f"Failed to run pipeline: {str(outcome['error'])}")
+        return None
+    progress_bar.progress(1.0)
+    st.success("Pipeline completed successfully!")
+    return Path(outcome["final_csv"])
+
+def _subprocess_env() -> dict:
+    # unbuffered child stdout so stage output (and the progress bar) arrives as it happens;
+    # UTF-8 stdio so the ✓/✗ stage markers decode the same on every platform
+    return {**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONUTF8": "1"}
+
+def _run_pipeline_subprocess(input_csv: bytes, output_dir="outputs", delay=1.0, batch_size=None):
     """
-    Run the full compliance pipeline as a subprocess from the Streamlit app
+    Run the full compliance pipeline as a subprocess from the Streamlit app.
+    The CSV bytes are piped to the pipeline's stdin instead of going through a temp file.
     """
     output_area = st.empty()
     progress_bar = st.progress(0)
     os.makedirs(output_dir, exist_ok=True)
     cmd = [
-        "python", "-m", "src.pipelines.start_pipeline",
-        "--input", str(input_file),
+        sys.executable, "-m", "src.pipelines.start_pipeline",
+        "--input", "-",
         "--outdir", str(output_dir),
         "--llm-min-interval", str(delay)
     ]
+    if batch_size:
+        cmd += ["--batch-size", str(batch_size)]
     try:
-        output_text = ""
+        log_buf = collections.deque(maxlen=LOG_BUFFER_LINES)
+        last_flush = 0.0
+        # binary pipe + selector: drain output in 64 KiB reads and only decode complete lines
         process = subprocess.Popen(
             cmd,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
+            bufsize=SUBPROCESS_READ_SIZE,
+            env=_subprocess_env(),
         )
+
+        # feed stdin from a helper thread so a chatty child can't deadlock on a full stdout pipe
+        def _feed_stdin():
+            try:
+                process.stdin.write(input_csv)
+            finally:
+                process.stdin.close()
+        threading.Thread(target=_feed_stdin, daemon=True).start()
         pipeline_stages = 5
         current_stage = 0
-        for line in iter(process.stdout.readline, ""):
-            output_text += line
-            output_area.text_area("Pipeline Output", output_text, height=200)
-            if ("done" in line.lower() or 
-                "complete" in line.lower() or 
-                "finished" in line.lower() or
-                "success" in line.lower() or
-                any(char in line for char in ["✓", "✗", "√", "x"])):
-                current_stage += 1
-                progress = min(current_stage / pipeline_stages, 1.0)
-                progress_bar.progress(progress)
+        pending = bytearray()
+        sel = selectors.DefaultSelector()
+        sel.register(process.stdout, selectors.EVENT_READ)
+        stdout_open = True
+        while stdout_open:
+            for key, _ in sel.select(timeout=0.1):
+                data = os.read(key.fd, SUBPROCESS_READ_SIZE)
+                if not data:
+                    stdout_open = False
+                    break
+                pending += data
+            *complete, rest = pending.split(b"\n")
+            pending = bytearray(rest)
+            if not stdout_open and rest:
+                complete.append(rest)  # unterminated last line
+            if complete:
+                # one decode + one regex scan per drained block, one progress update at most
+                block = b"\n".join(complete).decode("utf-8", errors="replace").replace("\r", "")
+                log_buf.extend(block.split("\n"))
+                finished = len(_STAGE_DONE_RE.findall(block))
+                if finished:
+                    current_stage += finished
+                    progress_bar.progress(min(current_stage / pipeline_stages, 1.0))
+            # re-render at most ~5x/sec, and only the tail, instead of the whole log per line
+            now = time.monotonic()
+            if now - last_flush > LOG_FLUSH_INTERVAL:
+                output_area.text_area("Pipeline Output", "\n".join(list(log_buf)[-LOG_VISIBLE_LINES:]), height=200)
+                last_flush = now
+        sel.close()
+        process.stdout.close()
         rc = process.wait()
+        output_area.text_area("Pipeline Output", "\n".join(list(log_buf)[-LOG_VISIBLE_LINES:]), height=200)
         progress_bar.progress(1.0)
         if rc == 0:
             st.success("Pipeline completed successfully!")
@@ -56,6 +166,37 @@ def run_full_pipeline(input_file, output_dir="outputs", delay=1.0):
         st.error(f"Failed to run pipeline: {str(e)}")
         return None
 
+@st.cache_data
+def _load_terminology(path: str, mtime: float) -> dict:
+    # mtime is part of the cache key so edits to the file are picked up on the next rerun
+    return load_json_file(path)
+
+@st.cache_data
+def _to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # download_button payloads are rebuilt on every rerun; encode each distinct frame once
+    return df.to_csv(index=False).encode("utf-8")
+
+@st.cache_data
+def _csv_preview(digest: str, _raw: bytes):
+    """
+    Header/first rows, row count and duplicate-feature count for an upload;
+    keyed by the upload's SHA-256. Counts are None when required columns are missing.
+    """
+    preview_df = pd.read_csv(io.BytesIO(_raw), nrows=5)
+    n_rows = None
+    n_dupes = None
+    if {"feature_name", "feature_description"}.issubset(preview_df.columns):
+        n_rows = 0
+        seen = set()
+        for chunk in pd.read_csv(io.BytesIO(_raw), usecols=["feature_name", "feature_description"],
+                                 dtype=str, keep_default_na=False, chunksize=5000):
+            n_rows += len(chunk)
+            keys = (chunk["feature_name"].str.strip().str.lower() + "\x1f"
+                    + chunk["feature_description"].str.strip().str.lower())
+            seen.update(keys)
+        n_dupes = n_rows - len(seen)
+    return preview_df, n_rows, n_dupes
+
 st.set_page_config(
     page_title="Geo-Compliance Classifier", 
     layout="wide",
@@ -88,13 +229,23 @@ with st.sidebar:
         try:
             terminology_path = Path("data") / "terminology.json"
             if terminology_path.exists():
-                with open(terminology_path, 'r') as f:
-                    terminology = json.load(f)
-                    st.json(terminology)
+                terminology = _load_terminology(str(terminology_path), terminology_path.stat().st_mtime)
+                st.json(terminology)
             else:
                 st.info("Terminology file not found")
         except Exception as e:
             st.error(f"Error loading terminology: {str(e)}")
+    st.subheader("LLM Cache")
+    try:
+        cache_stats = get_cache().stats()
+        col_hit, col_miss = st.columns(2)
+        with col_hit:
+            st.metric("Cache Hits", cache_stats["exact_hits"] + cache_stats["semantic_hits"])
+        with col_miss:
+            st.metric("Cache Misses", cache_stats["misses"])
+        st.caption(f"{cache_stats['semantic_hits']} near-duplicate hits (cosine ≥ 0.95)")
+    except Exception as e:
+        st.caption(f"Cache unavailable: {str(e)}")
 
 def display_results(result):
     col1, col2 = st.columns(2)
@@ -129,14 +280,20 @@ uploaded_file = st.file_uploader("Choose CSV File", type="csv")
 
 if uploaded_file is not None:
     try:
-        df = pd.read_csv(uploaded_file)
-        if not {"feature_name", "feature_description"}.issubset(df.columns):
+        # Only the header + first rows are parsed for validation/preview; the row count is
+        # streamed in chunks so large uploads never sit fully in memory as a DataFrame.
+        # Both are cached per upload, so widget reruns don't touch the CSV again.
+        raw_csv = uploaded_file.getvalue()
+        preview_df, n_rows, n_dupes = _csv_preview(hashlib.sha256(raw_csv).hexdigest(), raw_csv)
+        if n_rows is None:
             st.error("CSV file must contain 'feature_name' and 'feature_description' columns.")
         else:
             st.success("CSV file loaded successfully!")
             with st.expander("Preview Data"):
-                st.dataframe(df.head())
-            st.info(f"Found {len(df)} features to classify")
+                st.dataframe(preview_df)
+            st.info(f"Found {n_rows} features to classify")
+            if n_dupes:
+                st.caption(f"{n_dupes} duplicate features (same name + description) will reuse one LLM call")
             with st.expander("Pipeline Settings"):
                 delay = st.slider(
                     "LLM call interval (seconds)", 
@@ -151,52 +308,72 @@ if uploaded_file is not None:
                     value="outputs",
                     help="Directory where pipeline results will be saved"
                 )
+                use_subprocess = st.checkbox(
+                    "Run pipeline in a separate process",
+                    value=False,
+                    help="Isolate the pipeline in a child Python process (slower start-up)"
+                )
             if st.button("Start Compliance Pipeline", type="primary"):
-                temp_input = "temp_input.csv"
-                df.to_csv(temp_input, index=False)
                 with st.spinner("Running compliance pipeline..."):
                     final_csv = run_full_pipeline(
-                        input_file=temp_input,
+                        input_csv=raw_csv,
                         output_dir=output_dir,
-                        delay=delay
+                        delay=delay,
+                        batch_size=batch_size,
+                        use_subprocess=use_subprocess
                     )
-                try:
-                    os.remove(temp_input)
-                except:
-                    pass
                 if final_csv and final_csv.exists():
                     try:
-                        results_df = pd.read_csv(final_csv)
-                        st.success(f"Pipeline complete! Processed {len(results_df)} features.")
-                        needs_review_df = results_df[results_df['classification'] == 'NEEDS HUMAN REVIEW']
+                        # One chunked pass: count rows and keep only the review subset in memory.
+                        total_count = 0
+                        review_parts = []
+                        # the label column is low-cardinality: as a category the mask compares int codes
+                        for chunk in pd.read_csv(final_csv, chunksize=RESULTS_CHUNK_ROWS,
+                                                 dtype={RESULT_CLASS_COL: "category"}):
+                            total_count += len(chunk)
+                            review_mask = chunk[RESULT_CLASS_COL].eq("NEEDS HUMAN REVIEW")
+                            review_parts.append(chunk[review_mask])
+                        needs_review_df = pd.concat(review_parts, ignore_index=True) if review_parts else pd.DataFrame()
+                        st.success(f"Pipeline complete! Processed {total_count} features.")
                         human_review_count = len(needs_review_df)
                         col1, col2, col3 = st.columns(3)
                         with col1:
-                            st.metric("Total Features", len(results_df))
+                            st.metric("Total Features", total_count)
                         with col2:
                             st.metric("Need Human Review", human_review_count)
                         with col3:
-                            st.metric("Automated Classification", len(results_df) - human_review_count)
+                            st.metric("Automated Classification", total_count - human_review_count)
                         if human_review_count > 0:
                             st.warning(f"⚠️ {human_review_count} features require human review")
                             with st.expander("Features Requiring Human Review", expanded=True):
                                 st.dataframe(needs_review_df)
-                            human_review_csv = needs_review_df.to_csv(index=False).encode("utf-8")
                             st.download_button(
                                 label="Download Human Review Items as CSV",
-                                data=human_review_csv,
+                                data=_to_csv_bytes(needs_review_df),
                                 file_name="human_review_items.csv",
                                 mime="text/csv",
                             )
                         st.subheader("All Results")
-                        st.dataframe(results_df)
-                        csv_data = results_df.to_csv(index=False).encode("utf-8")
-                        st.download_button(
-                            label="Download All Results as CSV",
-                            data=csv_data,
-                            file_name="compliance_results.csv",
-                            mime="text/csv",
-                        )
+                        st.dataframe(pd.read_csv(final_csv, nrows=RESULTS_PREVIEW_ROWS))
+                        if total_count > RESULTS_PREVIEW_ROWS:
+                            st.caption(f"Showing first {RESULTS_PREVIEW_ROWS} of {total_count} rows — download for the full table.")
+                        # serve the pipeline's CSV bytes directly; no DataFrame -> CSV re-encode
+                        with open(final_csv, "rb") as f:
+                            st.download_button(
+                                label="Download All Results as CSV",
+                                data=f,
+                                file_name="compliance_results.csv",
+                                mime="text/csv",
+                            )
+                        final_parquet = final_csv.with_suffix(".parquet")
+                        if final_parquet.exists():
+                            with open(final_parquet, "rb") as f:
+                                st.download_button(
+                                    label="Download All Results as Parquet",
+                                    data=f,
+                                    file_name="compliance_results.parquet",
+                                    mime="application/octet-stream",
+                                )
                     except Exception as e:
                         st.error(f"Error loading results: {str(e)}")
     except Exception as e:
@@ -4,14 +4,28 @@ Allows teams to classify features directly from Slack using slash commands.
 """
 
 import os
+import re
+import contextlib
 import json
+import functools
+import threading
+import shutil
+import tempfile
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+import requests
 from dotenv import load_dotenv
 from src.processors.gemini_classifier import GeminiClassifier
 from src.processors.text_preprocessor import expand_terminology
+from src.pipelines.start_pipeline import run_pipeline
+from src.utils.rate_limit import TokenBucket
+from src.cache.llm_cache import COMMAND, INFO, request_intent
 import pandas as pd
 from datetime import datetime
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
@@ -19,8 +33,84 @@ load_dotenv()
 # Initialize Slack app
 app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
 
-# Initialize classifier
-classifier = GeminiClassifier()
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_classifier() -> GeminiClassifier:
+    """Classifier built on first use, so importing/starting the bot doesn't wait on Gemini setup."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = GeminiClassifier()
+    return _classifier
+
+@functools.lru_cache(maxsize=None)
+def _http_session() -> requests.Session:
+    """One keep-alive session for Slack file downloads (reuses the TLS connection)."""
+    session = requests.Session()
+    # one pooled connection per upload worker, so concurrent downloads all stay keep-alive
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(SLACK_WORKERS, 1))
+    session.mount("https://", adapter)
+    return session
+
+# Handlers only ack and enqueue; classification and pipeline runs happen here
+SLACK_WORKERS = int(os.environ.get("SLACK_WORKERS", "4"))
+executor = ThreadPoolExecutor(max_workers=SLACK_WORKERS)
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+SLACK_OUTPUT_ROOT = "outputs"
+# uploads whose pipeline runs at the same time (each one fans out its own LLM workers)
+SLACK_PIPELINE_SLOTS = threading.BoundedSemaphore(int(os.environ.get("SLACK_PIPELINE_SLOTS", "2")))
+TERMINOLOGY_PATH = "data/terminology.json"
+# Cache admission per request type: classifications are idempotent lookups and may be
+# answered from the LLM cache; a CSV upload is a command whose re-runs must recompute.
+REQUEST_TYPE = {"classify": INFO, "classify-batch": INFO, "file_shared": COMMAND}
+
+def _with_intent(request: str):
+    """Run the decorated worker under the cache intent of `request`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with request_intent(REQUEST_TYPE[request]):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+# partial-progress messages per /classify-batch (response_url allows 5 replies in total)
+SLACK_PROGRESS_UPDATES = 3
+
+# "name|desc;name|desc": one match per ';'-separated segment that has a '|',
+# split at the first '|', whitespace trimmed
+_PAIR_RE = re.compile(r'(?:^|;)\s*([^|;]*?)\s*\|\s*([^;]*?)\s*(?=;|$)')
+
+_CLASSIFY_RE = re.compile(r'classify', re.IGNORECASE)
+
+CLASSIFICATION_EMOJI = {
+    'REQUIRED': '🔴',
+    'NOT REQUIRED': '✅',
+    'NEEDS HUMAN REVIEW': '🟡',
+}
+
+# Slack allows roughly 1 request/s per method with short bursts; 429s are retried
+# by the SDK after the Retry-After delay it sends back
+SLACK_METHOD_RPS = 1.0
+SLACK_METHOD_BURST = 3
+SLACK_MAX_RETRIES = 3
+app.client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=SLACK_MAX_RETRIES))
+_method_buckets: dict = {}
+_method_buckets_lock = threading.Lock()
+
+def _paced(method: str, fn):
+    """Wrap a Slack call so it waits on the shared token bucket for `method`."""
+    with _method_buckets_lock:
+        bucket = _method_buckets.setdefault(
+            method, TokenBucket(rate=SLACK_METHOD_RPS, capacity=SLACK_METHOD_BURST))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bucket.acquire()
+        return fn(*args, **kwargs)
+    return wrapper
 
 @app.command("/classify")
 def classify_feature_command(ack, respond, command):
@@ -29,7 +119,11 @@ def classify_feature_command(ack, respond, command):
     Usage: /classify feature_name | feature_description
     """
     ack()
-    
+    # Gemini can take longer than Slack's 3 s window; reply later via response_url
+    executor.submit(_classify_feature, respond, command)
+
+@_with_intent("classify")
+def _classify_feature(respond, command):
     try:
         # Parse the command text
         text = command['text'].strip()
@@ -58,7 +152,7 @@ def classify_feature_command(ack, respond, command):
         })
         
         # Classify the feature
-        result = classifier.classify_feature(feature_name, feature_description)
+        result = get_classifier().classify_feature(feature_name, feature_description)
         
         # Format the response
         if 'Error!' in result:
@@ -73,11 +167,7 @@ def classify_feature_command(ack, respond, command):
             regulations = result.get('related_regulations', [])
             
             # Choose emoji based on classification
-            emoji = {
-                'REQUIRED': '🔴',
-                'NOT REQUIRED': '✅', 
-                'NEEDS HUMAN REVIEW': '🟡'
-            }.get(classification, '❓')
+            emoji = CLASSIFICATION_EMOJI.get(classification, '❓')
             
             blocks = [
                 {
@@ -136,7 +226,10 @@ def classify_batch_command(ack, respond, command):
     Usage: /classify-batch feature1|desc1;feature2|desc2;...
     """
     ack()
-    
+    executor.submit(_classify_batch, respond, command)
+
+@_with_intent("classify-batch")
+def _classify_batch(respond, command):
     try:
         text = command['text'].strip()
         if not text:
@@ -146,18 +239,11 @@ def classify_batch_command(ack, respond, command):
             })
             return
         
-        # Parse multiple features
-        feature_pairs = text.split(';')
-        features_batch = []
-        
-        for pair in feature_pairs:
-            if '|' not in pair:
-                continue
-            name, desc = pair.split('|', 1)
-            features_batch.append({
-                'feature_name': name.strip(),
-                'feature_description': desc.strip()
-            })
+        # Parse multiple features (one regex pass; segments without '|' are skipped)
+        features_batch = [
+            {'feature_name': m.group(1), 'feature_description': m.group(2)}
+            for m in _PAIR_RE.finditer(text)
+        ]
         
         if not features_batch:
             respond({
@@ -172,8 +258,23 @@ def classify_batch_command(ack, respond, command):
             "response_type": "ephemeral"
         })
         
-        # Classify batch
-        results = classifier.classify_features_batch(features_batch)
+        # Classify batch, reporting partial progress as answers come in. response_url
+        # accepts only 5 messages, so progress is posted at a few fixed checkpoints.
+        total = len(features_batch)
+        checkpoints = {max(1, total * k // (SLACK_PROGRESS_UPDATES + 1)) for k in range(1, SLACK_PROGRESS_UPDATES + 1)}
+        done = 0
+
+        def _progress(i, result):
+            nonlocal done
+            done += 1
+            if done in checkpoints and done < total:
+                name = result.get('input_feature_name') or features_batch[i]['feature_name']
+                respond({
+                    "text": f"⏳ {done}/{total} classified — latest: *{name}*: {result.get('classification', 'UNKNOWN')}",
+                    "response_type": "ephemeral"
+                })
+
+        results = get_classifier().classify_features_batch(features_batch, on_result=_progress)
         
         # Format results
         blocks = [
@@ -186,10 +287,11 @@ def classify_batch_command(ack, respond, command):
             }
         ]
         
-        # Summary
-        required_count = sum(1 for r in results if r.get('classification') == 'REQUIRED')
-        not_required_count = sum(1 for r in results if r.get('classification') == 'NOT REQUIRED')
-        review_count = sum(1 for r in results if r.get('classification') == 'NEEDS HUMAN REVIEW')
+        # Summary (single pass over results)
+        class_counts = Counter(r.get('classification') for r in results)
+        required_count = class_counts['REQUIRED']
+        not_required_count = class_counts['NOT REQUIRED']
+        review_count = class_counts['NEEDS HUMAN REVIEW']
         
         blocks.append({
             "type": "section",
@@ -217,13 +319,9 @@ def classify_batch_command(ack, respond, command):
         
         # Individual results (limit to 10 for readability)
         for i, result in enumerate(results[:10]):
-            emoji = {
-                'REQUIRED': '🔴',
-                'NOT REQUIRED': '✅', 
-                'NEEDS HUMAN REVIEW': '🟡'
-            }.get(result.get('classification'), '❓')
+            emoji = CLASSIFICATION_EMOJI.get(result.get('classification'), '❓')
             
-            feature_name = result.get('original_feature_name', f'Feature {i+1}')
+            feature_name = result.get('input_feature_name', f'Feature {i+1}')
             classification = result.get('classification', 'UNKNOWN')
             confidence = result.get('confidence', 0)
             
@@ -260,111 +358,110 @@ def classify_batch_command(ack, respond, command):
 def handle_file_upload(event, say, client):
     """
     Handle CSV file uploads and process them through batch classifier.
+    Download, pipeline run and upload happen on the worker pool, so the
+    listener returns right away and Slack does not redeliver the event.
     """
+    executor.submit(_process_uploaded_file, event, say, client)
+
+@_with_intent("file_shared")
+def _process_uploaded_file(event, say, client):
+    temp_file_path = None
+    job_dir = None
+    # several calls per upload: pace each Slack method so concurrent drops stay under its limit
+    say = _paced("chat.postMessage", say)
+    update = _paced("chat.update", client.chat_update)
+    # one status message per upload, edited in place as the job progresses
+    status_lines = []
+    status_msg = {}
+
+    def status(text):
+        status_lines.append(text)
+        body = "\n".join(status_lines)
+        if status_msg:
+            update(channel=status_msg["channel"], ts=status_msg["ts"], text=body)
+        else:
+            resp = say(body)
+            status_msg.update(channel=resp["channel"], ts=resp["ts"])
+
     try:
         file_id = event["file_id"]
         
         # Get file info
-        file_info = client.files_info(file=file_id)
+        file_info = _paced("files.info", client.files_info)(file=file_id)
         file_data = file_info["file"]
         
         # Check if it's a CSV file
         if not (file_data["filetype"] == "csv" or file_data["name"].endswith('.csv')):
-            say(f"❌ Please upload a CSV file. Received: {file_data['name']}")
+            status(f"❌ Please upload a CSV file. Received: {file_data['name']}")
             return
         
-        # Download the file
-        file_content = client.files_info(file=file_id, token=os.environ.get("SLACK_BOT_TOKEN"))
-        file_url = file_content["file"]["url_private"]
+        # Download the file (files.info above already returned its private URL)
+        file_url = file_data["url_private"]
         
         # Send processing message
-        say(f"🔍 Processing CSV file: *{file_data['name']}*...")
-        say("⏳ This may take a few minutes depending on file size...")
+        status(f"🔍 Processing CSV file: *{file_data['name']}*...\n⏳ This may take a few minutes depending on file size...")
         
-        # Download and save the file temporarily
-        import requests
+        # Download and save the file temporarily, streaming network -> disk in 1 MB chunks
         headers = {"Authorization": f"Bearer {os.environ.get('SLACK_BOT_TOKEN')}"}
-        response = requests.get(file_url, headers=headers)
+        with _http_session().get(file_url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code != 200:
+                status("❌ Failed to download file from Slack")
+                return
+            # unique path, so concurrent uploads of the same file name don't collide
+            with tempfile.NamedTemporaryFile("wb", prefix="temp_", suffix=".csv", delete=False) as f:
+                temp_file_path = f.name
+                # raw is the undecoded body; let urllib3 undo any Content-Encoding (e.g. gzip)
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_BYTES)
         
-        if response.status_code != 200:
-            say("❌ Failed to download file from Slack")
+        # a private output directory per upload: concurrent jobs can't overwrite each
+        # other's stage files, and this job's report is the only zip in it
+        os.makedirs(SLACK_OUTPUT_ROOT, exist_ok=True)
+        job_dir = tempfile.mkdtemp(prefix="slack_", dir=SLACK_OUTPUT_ROOT)
+        status(f"� Running compliance pipeline on uploaded file...")
+        # in-process on this worker thread: no interpreter spawn / SDK re-import per upload
+        try:
+            with SLACK_PIPELINE_SLOTS:
+                run_pipeline(temp_file_path, TERMINOLOGY_PATH, job_dir)
+        except Exception as e:
+            status(f"❌ Pipeline failed: {e}")
             return
-        
-        # Save temporarily
-        temp_file_path = f"temp_{file_data['name']}"
-        with open(temp_file_path, 'wb') as f:
-            f.write(response.content)
-        
-        # Run the new pipeline with the uploaded CSV
-        import subprocess
-        import sys
-        
-        # Use the same Python executable that's running this script
-        python_cmd = sys.executable
-        pipeline_cmd = [
-            python_cmd, "src/pipelines/start_pipeline.py",
-            "--input", temp_file_path,
-            "--terms", "data/terminology.json",
-            "--outdir", "outputs"
-        ]
-        say(f"� Running compliance pipeline on uploaded file...")
-        result = subprocess.run(pipeline_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            say(f"❌ Pipeline failed: {result.stderr}")
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            return
-        say(f"✅ Pipeline completed! Uploading results...")
+        status(f"✅ Pipeline completed! Uploading results...")
 
-        # Look for the generated ZIP file (follows pattern: final_report_YYYYMMDD_HHMMSS.zip)
-        import glob
-        zip_pattern = "outputs/final_report_*.zip"
-        zip_files = glob.glob(zip_pattern)
+        # The generated ZIP file (final_report_YYYYMMDD_HHMMSS.zip) in this job's directory
+        latest_zip = next((str(p) for p in Path(job_dir).glob("final_report_*.zip")), None)
         
-        if zip_files:
-            # Get the most recent ZIP file
-            latest_zip = max(zip_files, key=os.path.getctime)
+        if latest_zip:
             
             # Upload the ZIP file
             channel_id = file_data.get("channels", [None])[0] if file_data.get("channels") else None
             if not channel_id:
                 channel_id = event.get("channel_id")
             
-            client.files_upload_v2(
+            _paced("files.upload", client.files_upload_v2)(
                 channel=channel_id,
                 file=latest_zip,
                 title=f"Complete Compliance Report - {file_data['name']}",
                 initial_comment="📦 Here's the complete compliance analysis report with all processing details!"
             )
-            say(f"✅ Complete report uploaded: {os.path.basename(latest_zip)}")
-            
-            # Try to show summary from ZIP contents, but don't require it
-            say(f"📦 ZIP file contains all processing results and final classifications")
+            status(f"✅ Complete report uploaded: {os.path.basename(latest_zip)}\n"
+                   f"📦 ZIP file contains all processing results and final classifications")
         else:
-            say(f"❌ ZIP file not found - pipeline may have failed")
+            status(f"❌ ZIP file not found - pipeline may have failed")
             return
-
-        # Clean up temp file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-        
-        # Clean up temp file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
             
     except Exception as e:
-        say(f"❌ Error processing file: {str(e)}")
-        # Clean up temp file on error
-        temp_file_path = f"temp_{event.get('file', {}).get('name', 'unknown')}"
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        status(f"❌ Error processing file: {str(e)}")
+    finally:
+        # Clean up temp file (EAFP: no exists() probe to race with the remove)
+        if temp_file_path:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_file_path)
+        # the report has been uploaded (or the job failed); its stage files are not reused
+        if job_dir:
+            shutil.rmtree(job_dir, ignore_errors=True)
 
-@app.command("/compliance-help")
-def help_command(ack, respond):
-    """Show help for compliance classification commands."""
-    ack()
-    
-    help_text = """
+HELP_TEXT = """
 🤖 *TikTok Geo-Compliance Classifier*
 
 *Available Commands:*
@@ -417,19 +514,20 @@ Bug fix,Fixed memory leak in video processing
 • Utah Social Media Regulation Act
 • US NCMEC reporting requirements
 """
-    
-    respond({
-        "text": help_text,
-        "response_type": "ephemeral"
-    })
+
+HELP_PAYLOAD = {"text": HELP_TEXT, "response_type": "ephemeral"}
+
+@app.command("/compliance-help")
+def help_command(ack, respond):
+    """Show help for compliance classification commands."""
+    ack()
+    respond(HELP_PAYLOAD)
 
 # Event listener for app mentions
 @app.event("app_mention")
 def handle_app_mention(event, say):
     """Handle when the bot is mentioned in a channel."""
-    text = event.get('text', '').lower()
-    
-    if 'classify' in text:
+    if _CLASSIFY_RE.search(event.get('text') or ''):
         say({
             "text": "👋 I can help classify TikTok features for geo-compliance! Use `/classify feature_name | description` or `/compliance-help` for more info.",
             "thread_ts": event.get('ts')
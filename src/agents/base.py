@@ -1,9 +1,75 @@
-from dataclasses import dataclass
+import functools
+import threading
+import warnings
+from dataclasses import asdict, dataclass
 from typing import Dict, Any, Optional
 import re
 import json, re, time
-from typing import Iterable, Optional, Dict, Any, List, Tuple
+from typing import Iterable, Optional, Dict, Any, List, Pattern, Set, Tuple, Union
+import numpy as np
+import pandas as pd
 from src.utils.get_context import get_context
+from src.cache.llm_cache import get_cache
+from src.utils.json_parser import loads_json
+
+try:
+    import hyperscan  # optional: matches every rule pattern in one SIMD pass
+except ImportError:
+    hyperscan = None
+
+@functools.lru_cache(maxsize=None)
+def _compile_ci(pattern: str) -> Pattern:
+    return re.compile(pattern, re.I)
+
+def _ci(pattern: Union[str, Pattern]) -> Pattern:
+    """Precompiled patterns pass through; raw strings are compiled (case-insensitive) once."""
+    return pattern if isinstance(pattern, re.Pattern) else _compile_ci(pattern)
+
+class RuleSet:
+    """
+    Named rule patterns matched case-insensitively against a text in one call.
+    With Hyperscan installed all patterns share one compiled database (a single scan
+    per text); otherwise, or if a pattern is outside Hyperscan's syntax, each
+    precompiled `re` pattern is searched in turn.
+    """
+
+    def __init__(self, patterns: Dict[str, str]) -> None:
+        self.names = list(patterns)
+        self._res = [re.compile(p, re.I) for p in patterns.values()]
+        self._db = None
+        self._local = threading.local()  # scratch space is per scanning thread
+        if hyperscan is not None:
+            n = len(self.names)
+            try:
+                db = hyperscan.Database()
+                db.compile(expressions=[p.encode("utf-8") for p in patterns.values()],
+                           ids=list(range(n)), elements=n,
+                           flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * n)
+                self._db = db
+            except Exception:
+                self._db = None
+
+    def matches(self, text: str) -> Set[str]:
+        """Names of the patterns that occur anywhere in text."""
+        if self._db is None:
+            return {name for name, rx in zip(self.names, self._res) if rx.search(text)}
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._db)
+        hit: Set[int] = set()
+        self._db.scan(text.encode("utf-8"), match_event_handler=lambda i, *_: hit.add(i), scratch=scratch)
+        return {self.names[i] for i in hit}
+
+# LLM replies: optional ```json fences, and the first {...} block when there is surrounding prose
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.I | re.M)
+_OBJ_RE = re.compile(r"\{.*\}", re.S)
+
+# Audited LLM bypass: when the LLM is enabled, a row whose rule score is below TRIVIAL_MAX_SCORE
+# and that reads as a plain engineering chore is answered OK without it, even in "always" mode. Agents that
+# use it also require that minors are not mentioned.
+TRIVIAL_CHANGE_RE = re.compile(r"\b(bug\s*fix|typo|refactor|rename|cleanup|lint)\b", re.I)
+TRIVIAL_MAX_SCORE = 0.05
+TRIVIAL_REASON = "Trivial engineering change (bug fix/typo/refactor); LLM skipped."
 
 @dataclass
 class AgentVerdict:
@@ -13,6 +79,8 @@ class AgentVerdict:
     reasoning: str
     suggestions: Optional[str] = None
 
+VERDICT_COLUMNS = ["agent", "status", "score", "reasoning", "suggestions"]
+
 class BaseAgent:
     name: str = "BaseAgent"
     domain: str = "General"
@@ -30,8 +98,43 @@ class BaseAgent:
         return f"{name}\n{desc}"
 
     @staticmethod
-    def has(pattern: str, text: str) -> bool:
-        return re.search(pattern, text, flags=re.I) is not None
+    def has(pattern: Union[str, Pattern], text: str) -> bool:
+        return _ci(pattern).search(text) is not None
+
+    def texts(self, df: pd.DataFrame) -> pd.Series:
+        """text() for every row of df, aligned with df.index."""
+        return pd.Series([self.text(r) for r in df.to_dict("records")], index=df.index, dtype=object)
+
+    @staticmethod
+    def contains(texts: pd.Series, pattern: str) -> pd.Series:
+        """Column-wise has(): boolean Series, case-insensitive."""
+        with warnings.catch_warnings():
+            # groups in the rule patterns are only there for alternation
+            warnings.simplefilter("ignore", UserWarning)
+            return texts.str.contains(pattern, regex=True, flags=re.I)
+
+    def check_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Verdicts for every row of df (VERDICT_COLUMNS), indexed like df. Row-by-row unless overridden."""
+        rows = [asdict(self.check(r)) for r in df.to_dict("records")]
+        return pd.DataFrame(rows, index=df.index, columns=VERDICT_COLUMNS)
+
+    def _batch_verdicts(self, df: pd.DataFrame, score: pd.Series, reasons: Dict[str, str]) -> pd.DataFrame:
+        """
+        Shared tail of the vectorized check_batch overrides: bucket rule scores into
+        ISSUE (>= 0.65) / REVIEW (>= 0.35) / OK. Rules only; the runner sends LLM-enabled
+        agents through check() one task per row instead.
+        """
+        score = score.clip(upper=1.0)
+        status = pd.Series(np.select([score >= 0.65, score >= 0.35], ["ISSUE", "REVIEW"], "OK"),
+                           index=df.index)
+        out = pd.DataFrame({
+            "agent": self.name,
+            "status": status,
+            "score": score.round(2),
+            "reasoning": status.map(reasons),
+            "suggestions": None,
+        }, index=df.index, columns=VERDICT_COLUMNS)
+        return out
 
     def llm_json(self, prompt: str, *,
                  expect_keys: Iterable[str] = ("status","reasoning"),
@@ -44,34 +147,43 @@ class BaseAgent:
             return None
 
         def _parse(raw: str) -> Optional[Dict[str, Any]]:
-            raw = (raw or "").strip()
-            # strip ```json fences if any
-            raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw, flags=re.I|re.M)
-            # try direct JSON
+            raw = _FENCE_RE.sub("", (raw or "").strip())
+            # JSON mode: the whole reply is normally one object
             try:
-                obj = json.loads(raw)
+                obj = loads_json(raw)
                 if isinstance(obj, dict):
                     return obj
-            except Exception:
+            except ValueError:
                 pass
             # try first {...} block
-            m = re.search(r"\{.*\}", raw, flags=re.S)
+            m = _OBJ_RE.search(raw)
             if m:
                 try:
-                    obj = json.loads(m.group(0))
+                    obj = loads_json(m.group(0))
                     if isinstance(obj, dict):
                         return obj
-                except Exception:
+                except ValueError:
                     pass
             return None
 
+        # verdict cache: exact prompt match, or a near-identical row TEXT for the same agent;
+        # a hit also skips the context retrieval below
+        cache = get_cache()
+        scope = f"agent:{self.name}"
+        payload = {"agent": self.name, "prompt": prompt}
+        row_text = prompt.rpartition("TEXT:\n")[2]
+        hit = cache.get(payload, text=row_text, scope=scope)
+        if isinstance(hit, dict) and all(k in hit for k in expect_keys):
+            return hit
+
         ask = prompt
         context = get_context(ask)  # ensure context is loaded
 
         for _ in range(retries + 1):
-            raw = self.llm.generate(context+ask)
+            raw = self.llm.generate(self._with_context(ask, context))
             obj = _parse(raw)
             if obj and all(k in obj for k in expect_keys):
+                cache.set(payload, obj, text=row_text, scope=scope)
                 return obj
             # tighten schema on retry
             ask = (
@@ -80,10 +192,22 @@ class BaseAgent:
                 '"risk_factors":[],"regions":[],"regulations":[],"mitigations":[]}.\n\n'
                 + prompt
             )
-            time.sleep(0.05)
         return None
 
     @staticmethod
-    def cooc(text: str, *patterns: str) -> bool:
+    def _with_context(prompt: str, context: str) -> str:
+        """
+        Agent instructions first, then the retrieved context, then the row's TEXT section.
+        The instruction block is the same for every row of an agent, but at a few hundred
+        tokens it is below Gemini's minimum cacheable prefix, so this ordering is for a
+        stable, readable layout; it brings no prefix-cache saving on its own.
+        """
+        head, sep, tail = prompt.rpartition("TEXT:\n")
+        if not sep:
+            return context + prompt
+        return head + context + sep + tail
+
+    @staticmethod
+    def cooc(text: str, *patterns: Union[str, Pattern]) -> bool:
         """True if ALL patterns occur (case-insensitive) anywhere in text."""
-        return all(re.search(p, text, flags=re.I) for p in patterns)
\ No newline at end of file
+        return all(_ci(p).search(text) for p in patterns)
\ No newline at end of file
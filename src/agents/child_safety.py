@@ -1,10 +1,13 @@
 from __future__ import annotations
-import re
-from .base import BaseAgent, AgentVerdict
+from .base import BaseAgent, AgentVerdict, RuleSet, TRIVIAL_CHANGE_RE, TRIVIAL_MAX_SCORE, TRIVIAL_REASON
 
 CHILD_TERMS = r"\b(minor|teen|teenager(s)?|child|kids?|underage|youth)\b"
 AGE_CTRL    = r"\bage[-\s]*(gate|verification|check|limit|restriction|sensitive)\b"
 MOD_SIGNALS = r"\bmoderation|moderate|review(ing)?|flag(ged|ging)?|stricter\b"
+POLICY      = r"\bpolicy\s*(framework)?\b"
+
+# compiled once at import; check() runs on every row regardless of LLM mode
+RULES = RuleSet({"child": CHILD_TERMS, "age": AGE_CTRL, "mod": MOD_SIGNALS, "policy": POLICY})
 
 class ChildSafetyAgent(BaseAgent):
     name = "ChildSafetyAgent"
@@ -29,14 +32,21 @@ class ChildSafetyAgent(BaseAgent):
     def check(self, row) -> AgentVerdict:
         t = self.text(row)
 
+        # one pass over the text; co-occurrence bonuses reuse the hit set
+        hit = RULES.matches(t)
+        child = "child" in hit
         s = 0.0
-        if self.has(CHILD_TERMS, t): s += 0.30
-        if self.has(AGE_CTRL, t):    s += 0.30
-        if self.cooc(t, CHILD_TERMS, AGE_CTRL): s += 0.20
-        if self.cooc(t, CHILD_TERMS, MOD_SIGNALS): s += 0.25
-        if self.cooc(t, CHILD_TERMS, r"\bpolicy\s*(framework)?\b"): s += 0.10
+        if child: s += 0.30
+        if "age" in hit: s += 0.30
+        if child and "age" in hit: s += 0.20
+        if child and "mod" in hit: s += 0.25
+        if child and "policy" in hit: s += 0.10
         s = min(s, 1.0)
 
+        # a near-zero score here already means no minors terms
+        if self.llm and self.llm_enabled and s < TRIVIAL_MAX_SCORE and TRIVIAL_CHANGE_RE.search(t):
+            return AgentVerdict(agent=self.name, status="OK", score=0.0, reasoning=TRIVIAL_REASON)
+
         status = "OK"
         reasoning = "No explicit minors/age-control cues."
         if s >= 0.65:
@@ -62,3 +72,17 @@ class ChildSafetyAgent(BaseAgent):
                 s = {"ISSUE": 0.9, "REVIEW": 0.6, "OK": max(s, 0.5)}[status]
 
         return AgentVerdict(agent=self.name, status=status, score=round(s, 2), reasoning=reasoning)
+
+    def check_batch(self, df):
+        """check() for a whole frame: the rule score is computed column-wise, the LLM sees only REVIEW rows."""
+        t = self.texts(df)
+        child = self.contains(t, CHILD_TERMS)
+        age = self.contains(t, AGE_CTRL)
+        mod = self.contains(t, MOD_SIGNALS)
+        policy = self.contains(t, POLICY)
+        s = 0.30*child + 0.30*age + 0.20*(child & age) + 0.25*(child & mod) + 0.10*(child & policy)
+        return self._batch_verdicts(df, s, {
+            "ISSUE": "Strong minors + age-control indicators.",
+            "REVIEW": "Partial minors indicators.",
+            "OK": "No explicit minors/age-control cues.",
+        })
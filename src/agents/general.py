@@ -1,6 +1,6 @@
 from __future__ import annotations
-import re
-from .base import BaseAgent, AgentVerdict
+from .base import BaseAgent, AgentVerdict, RuleSet, TRIVIAL_CHANGE_RE, TRIVIAL_MAX_SCORE, TRIVIAL_REASON
+from .child_safety import CHILD_TERMS
 
 COMPLIANCE_LANGUAGE = [
     r"\bto\s+comply\s+with\b", r"\bin\s+accordance\s+with\b",
@@ -17,6 +17,13 @@ REGION_HINTS = [
     r"\bKR\b|\bKorea\b", r"\bJP\b|\bJapan\b", r"\bIN\b|\bIndia\b",
 ]
 
+# each list folded into one alternation; all three groups are matched in a single pass
+COMPLIANCE_PAT = "|".join(f"(?:{p})" for p in COMPLIANCE_LANGUAGE)
+REGION_PAT = "|".join(f"(?:{p})" for p in REGION_HINTS)
+GUIDANCE_PAT = r"\bguardrail(s)?\b|\bguideline(s)?\b|\bpolicy\b"
+RULES = RuleSet({"compliance": COMPLIANCE_PAT, "region": REGION_PAT, "guidance": GUIDANCE_PAT})
+CHILD_RULES = RuleSet({"child": CHILD_TERMS})
+
 class GeneralComplianceAgent(BaseAgent):
     name = "GeneralComplianceAgent"
     domain = "GeneralCompliance"
@@ -36,16 +43,21 @@ class GeneralComplianceAgent(BaseAgent):
         )
 
     def _rule_score(self, t: str) -> float:
+        hit = RULES.matches(t)
         s = 0.0
-        if any(re.search(p, t, re.I) for p in COMPLIANCE_LANGUAGE): s += 0.5
-        if any(re.search(p, t, re.I) for p in REGION_HINTS): s += 0.25
-        if re.search(r"\bguardrail(s)?\b|\bguideline(s)?\b|\bpolicy\b", t, re.I): s += 0.15
+        if "compliance" in hit: s += 0.5
+        if "region" in hit: s += 0.25
+        if "guidance" in hit: s += 0.15
         return min(s, 1.0)
 
     def check(self, row) -> AgentVerdict:
         t = self.text(row)
         s = self._rule_score(t)
 
+        if (self.llm and self.llm_enabled and s < TRIVIAL_MAX_SCORE
+                and TRIVIAL_CHANGE_RE.search(t) and not CHILD_RULES.matches(t)):
+            return AgentVerdict(agent=self.name, status="OK", score=0.0, reasoning=TRIVIAL_REASON)
+
         status = "OK"; reasoning = "No explicit compliance/region triggers."
         if s >= 0.65:
             status, reasoning = "ISSUE", "Compliance phrasing and/or region signals present."
@@ -65,3 +77,14 @@ class GeneralComplianceAgent(BaseAgent):
                 s = {"ISSUE": 0.9, "REVIEW": 0.6, "OK": max(s, 0.5)}[status]
 
         return AgentVerdict(agent=self.name, status=status, score=round(s, 2), reasoning=reasoning)
+
+    def check_batch(self, df):
+        """check() for a whole frame: the rule score is computed column-wise, the LLM sees only REVIEW rows."""
+        t = self.texts(df)
+        s = (0.5*self.contains(t, COMPLIANCE_PAT) + 0.25*self.contains(t, REGION_PAT)
+             + 0.15*self.contains(t, GUIDANCE_PAT))
+        return self._batch_verdicts(df, s, {
+            "ISSUE": "Compliance phrasing and/or region signals present.",
+            "REVIEW": "Some compliance or region cues present.",
+            "OK": "No explicit compliance/region triggers.",
+        })
@@ -1,6 +1,5 @@
 from __future__ import annotations
-import re
-from .base import BaseAgent, AgentVerdict
+from .base import BaseAgent, AgentVerdict, RuleSet
 
 MOD_HINTS = [
     r"\bmoderation\b",
@@ -15,6 +14,14 @@ MOD_HINTS = [
 
 CHILD_TERMS = r"\b(minor|teen|teenager(s)?|child|kids?|underage|youth)\b"
 
+# hint i is named str(i); co-occurrence terms ride along in the same pass
+RULES = RuleSet({
+    **{str(i): p for i, p in enumerate(MOD_HINTS)},
+    "notice": r"\bnotice\b", "appeal": r"\bappeal",
+    "transparency": r"\btransparency\b", "report": r"\breport",
+    "child": CHILD_TERMS, "moderate": r"\bmoderation|moderate|stricter\b",
+})
+
 class ModerationAgent(BaseAgent):
     name = "ModerationAgent"
     domain = "Content Moderation / Illegal Content"
@@ -34,14 +41,15 @@ class ModerationAgent(BaseAgent):
         )
 
     def _rule_score(self, t: str) -> float:
+        hit = RULES.matches(t)
         s = 0.0
         weights = [0.25,0.20,0.15,0.15,0.15,0.10,0.10,0.05]
-        for rx, w in zip(MOD_HINTS, weights):
-            if re.search(rx, t, re.I): s += w
+        for i, w in enumerate(weights):
+            if str(i) in hit: s += w
 
-        if self.cooc(t, r"\bnotice\b", r"\bappeal"): s += 0.15
-        if self.cooc(t, r"\btransparency\b", r"\breport"): s += 0.10
-        if self.cooc(t, CHILD_TERMS, r"\bmoderation|moderate|stricter\b"): s += 0.20
+        if {"notice", "appeal"} <= hit: s += 0.15
+        if {"transparency", "report"} <= hit: s += 0.10
+        if {"child", "moderate"} <= hit: s += 0.20
         return min(s, 1.0)
 
     def check(self, row) -> AgentVerdict:
@@ -1,6 +1,5 @@
 from __future__ import annotations
-import re
-from .base import BaseAgent, AgentVerdict
+from .base import BaseAgent, AgentVerdict, RuleSet
 
 PRIVACY_HINTS = [
     r"\bconsent\b", r"\bopt-?in\b", r"\bopt-?out\b",
@@ -10,6 +9,12 @@ PRIVACY_HINTS = [
     r"\bguest\s*mode\b", r"\bprivacy\b",
 ]
 
+# hint i is named str(i); the consent/retention co-occurrence rides along in the same pass
+RULES = RuleSet({
+    **{str(i): p for i, p in enumerate(PRIVACY_HINTS)},
+    "lifecycle": r"\b(retention|deletion|erasure|minimi[sz]ation)\b",
+})
+
 class PrivacyAgent(BaseAgent):
     name = "PrivacyAgent"
     domain = "Privacy & Data Protection"
@@ -29,12 +34,14 @@ class PrivacyAgent(BaseAgent):
         )
 
     def _rule_score(self, t: str) -> float:
+        hit = RULES.matches(t)
         s = 0.0
         bumps = [0.25,0.20,0.20,0.15,0.15,0.10,0.15,0.10,0.05]
-        for rx, w in zip(PRIVACY_HINTS, bumps):
-            if re.search(rx, t, re.I): s += w
+        for i, w in enumerate(bumps):
+            if str(i) in hit: s += w
 
-        if self.cooc(t, r"\bconsent\b", r"\b(retention|deletion|erasure|minimi[sz]ation)\b"): s += 0.15
+        # hint 0 is r"\bconsent\b"
+        if {"0", "lifecycle"} <= hit: s += 0.15
         return min(s, 1.0)
 
     def check(self, row) -> AgentVerdict:
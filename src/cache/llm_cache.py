@@ -0,0 +1,315 @@
+"""
+Response cache for Gemini calls.
+Tier 1 is an exact-match SQLite lookup keyed by a SHA-256 of the request payload.
+Tier 2 (optional) embeds the feature text with MiniLM and reuses a cached answer
+when a previous request is near-identical (cosine >= threshold).
+Both tiers skip entries older than the optional TTL (LLM_CACHE_TTL_SEC); the
+similarity threshold can be tuned with LLM_CACHE_SEMANTIC_THRESHOLD.
+Only informational requests are admitted: code running under
+request_intent(COMMAND) neither reads nor writes the cache.
+"""
+
+from __future__ import annotations
+import atexit
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.processors.text_preprocessor import expand_terminology
+
+DEFAULT_CACHE_PATH = Path("outputs") / "llm_cache.sqlite"
+SEMANTIC_THRESHOLD = float(os.environ.get("LLM_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+SQL_PARAM_CHUNK = 500  # stay under SQLite's host-parameter limit in IN (...) lookups
+STATS_FLUSH_EVERY = 100  # hit/miss counters are written to SQLite in batches of this many
+# entries older than this are ignored (unset = never expire); regulations change, answers go stale
+DEFAULT_TTL_SEC = float(os.environ["LLM_CACHE_TTL_SEC"]) if os.environ.get("LLM_CACHE_TTL_SEC") else None
+
+# Admission control. INFO requests (same input -> same answer, no side effects, e.g. /classify)
+# read and write the cache; a COMMAND (e.g. a CSV upload, which users re-run on purpose) always
+# recomputes. Worker pools that fan a request out must submit via contextvars.copy_context().run.
+INFO = "INFO"
+COMMAND = "COMMAND"
+_INTENT: contextvars.ContextVar[str] = contextvars.ContextVar("llm_cache_intent", default=INFO)
+
+@contextlib.contextmanager
+def request_intent(kind: str):
+    """Tag the LLM calls made inside the block (and in context-copying workers) as INFO or COMMAND."""
+    token = _INTENT.set(kind)
+    try:
+        yield
+    finally:
+        _INTENT.reset(token)
+
+def cache_admits() -> bool:
+    return _INTENT.get() == INFO
+
+def make_key(payload: Dict[str, Any]) -> str:
+    """Stable cache key for a request payload (e.g. name/description/model)."""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, path: str | Path = DEFAULT_CACHE_PATH,
+                 semantic_threshold: float = SEMANTIC_THRESHOLD,
+                 ttl_sec: Optional[float] = DEFAULT_TTL_SEC) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.semantic_threshold = semantic_threshold
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, scope TEXT, response TEXT, embedding BLOB)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+        # caches created before TTL support lack the write-time column
+        cols = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "ts" not in cols:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN ts REAL")
+        self._conn.commit()
+        # semantic tier is built lazily (sentence-transformers/faiss are heavy imports);
+        # a failed import disables it for the life of this instance
+        self._embedder = None
+        self._semantic = True
+        self._indexes: Dict[str, Tuple[Any, List[str]]] = {}
+        self._pending: Counter = Counter()
+        atexit.register(self.flush_stats)
+
+    # ----------------- stats -----------------
+    def _bump(self, name: str, amount: int = 1) -> None:
+        """Count in memory (caller holds _lock); written out every STATS_FLUSH_EVERY events."""
+        if amount <= 0:
+            return
+        self._pending[name] += amount
+        if sum(self._pending.values()) >= STATS_FLUSH_EVERY:
+            self._flush_pending()
+
+    def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT INTO stats(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(self._pending.items()),
+        )
+        self._conn.commit()
+        self._pending.clear()
+
+    def flush_stats(self) -> None:
+        with self._lock:
+            try:
+                self._flush_pending()
+            except sqlite3.ProgrammingError:
+                pass  # connection already closed at interpreter exit
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._flush_pending()
+            rows = self._conn.execute("SELECT name, value FROM stats").fetchall()
+        out = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        out.update({k: int(v) for k, v in rows})
+        return out
+
+    def _min_ts(self) -> float:
+        """Oldest write time still served (rows with no ts only count as fresh without a TTL)."""
+        return time.time() - self.ttl_sec if self.ttl_sec else float("-inf")
+
+    def _lookup(self, key: str) -> Optional[Tuple[str]]:
+        return self._conn.execute(
+            "SELECT response FROM responses WHERE key = ? AND (ts >= ? OR ? IS NULL)",
+            (key, self._min_ts(), self.ttl_sec),
+        ).fetchone()
+
+    # ----------------- semantic tier -----------------
+    def _embed_many(self, texts: List[str]):
+        """
+        Normalized float32 embeddings, one row per text (single encoder call), or None when
+        the semantic tier is unavailable or encoding fails. Called without _lock held, so
+        concurrent workers encode in parallel; only the one-off model load is serialized.
+        """
+        if not self._semantic:
+            return None
+        try:
+            if self._embedder is None:
+                with self._embed_lock:
+                    if self._embedder is None:
+                        from sentence_transformers import SentenceTransformer
+                        self._embedder = SentenceTransformer(EMBED_MODEL_NAME)
+            vecs = self._embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+            return vecs.astype("float32").reshape(len(texts), -1)
+        except ImportError:
+            self._semantic = False
+            return None
+        except Exception:
+            # semantic tier is best-effort
+            return None
+
+    def _index_for(self, scope: str, dim: int):
+        """FAISS inner-product index over all cached embeddings for one scope (model)."""
+        if scope not in self._indexes:
+            import faiss
+            import numpy as np
+            index = faiss.IndexFlatIP(dim)
+            keys: List[str] = []
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM responses WHERE scope = ? AND embedding IS NOT NULL",
+                (scope,),
+            ).fetchall()
+            if rows:
+                index.add(np.vstack([np.frombuffer(e, dtype="float32") for _, e in rows]))
+                keys = [k for k, _ in rows]
+            self._indexes[scope] = (index, keys)
+        return self._indexes[scope]
+
+    # ----------------- public API -----------------
+    def _nearest(self, scope: str, vecs) -> List[Optional[str]]:
+        """Cached key of the nearest neighbour above threshold per row of vecs (caller holds _lock)."""
+        try:
+            index, keys = self._index_for(scope, vecs.shape[1])
+            if not index.ntotal:
+                return [None] * len(vecs)
+            scores, ids = index.search(vecs, 1)
+            return [keys[ids[r][0]] if scores[r][0] >= self.semantic_threshold else None
+                    for r in range(len(vecs))]
+        except ImportError:
+            self._semantic = False
+        except Exception:
+            # semantic tier is best-effort; fall through to misses
+            pass
+        return [None] * len(vecs)
+
+    def get(self, payload: Dict[str, Any], text: Optional[str] = None,
+            scope: str = "") -> Optional[Any]:
+        """Return a cached response or None. `text` enables the semantic tier."""
+        return self.get_many([payload], [text], scope=scope)[0]
+
+    def set(self, payload: Dict[str, Any], response: Any, text: Optional[str] = None,
+            scope: str = "") -> None:
+        self.set_many([payload], [response], [text], scope=scope)
+
+    def get_many(self, payloads: List[Dict[str, Any]], texts: Optional[List[Optional[str]]] = None,
+                 scope: str = "") -> List[Optional[Any]]:
+        """
+        Batched get(): one SQL query for the exact tier, one encoder call + one FAISS search
+        for the semantic tier. Returns a list aligned with payloads. The encoder runs
+        between two short critical sections, not under the lock.
+        """
+        if not cache_admits():
+            return [None] * len(payloads)
+        keys = [make_key(p) for p in payloads]
+        out: List[Optional[Any]] = [None] * len(keys)
+        with self._lock:
+            found: Dict[str, str] = {}
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), SQL_PARAM_CHUNK):
+                part = unique[i:i + SQL_PARAM_CHUNK]
+                found.update(self._conn.execute(
+                    f"SELECT key, response FROM responses WHERE key IN ({','.join('?' * len(part))}) "
+                    "AND (ts >= ? OR ? IS NULL)", [*part, self._min_ts(), self.ttl_sec]
+                ).fetchall())
+        for i, k in enumerate(keys):
+            if k in found:
+                out[i] = json.loads(found[k])
+        exact = sum(1 for r in out if r is not None)
+        todo = [i for i, r in enumerate(out) if r is None and texts and texts[i]]
+        vecs = self._embed_many([texts[i] for i in todo]) if todo else None
+        semantic = 0
+        with self._lock:
+            if vecs is not None:
+                for i, near in zip(todo, self._nearest(scope, vecs)):
+                    hit = self._lookup(near) if near else None
+                    if hit:
+                        out[i] = json.loads(hit[0])
+                        semantic += 1
+            self._bump("exact_hits", exact)
+            self._bump("semantic_hits", semantic)
+            self._bump("misses", len(keys) - exact - semantic)
+        return out
+
+    def set_many(self, payloads: List[Dict[str, Any]], responses: List[Any],
+                 texts: Optional[List[Optional[str]]] = None, scope: str = "") -> None:
+        """Batched set(): one encoder call (outside the lock) and a single transaction."""
+        if not payloads or not cache_admits():
+            return
+        keys = [make_key(p) for p in payloads]
+        now = time.time()
+        vecs = self._embed_many(list(texts)) if texts and all(texts) else None
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses(key, scope, response, embedding, ts) VALUES(?, ?, ?, ?, ?)",
+                [(k, scope, json.dumps(r, ensure_ascii=False, default=str),
+                  vecs[i].tobytes() if vecs is not None else None, now)
+                 for i, (k, r) in enumerate(zip(keys, responses))],
+            )
+            self._conn.commit()
+            if vecs is not None and scope in self._indexes:
+                index, index_keys = self._indexes[scope]
+                index.add(vecs)
+                index_keys.extend(keys)
+
+@functools.lru_cache(maxsize=None)
+def get_cache(path: str = str(DEFAULT_CACHE_PATH)) -> LLMCache:
+    """Process-wide cache instance (one SQLite connection per path)."""
+    return LLMCache(path)
+
+def feature_request(model: str, feature_name: str, feature_description: str) -> Tuple[Dict[str, Any], str]:
+    """(payload, text) used to cache a single-feature classification."""
+    payload = {"name": feature_name, "description": feature_description, "model": model}
+    return payload, f"{feature_name}\n{feature_description}"
+
+# placeholder for a feature the batch reply left out; not an answer, so never cached
+MISSING_RESULT_REASON = "Result not found in batch response"
+
+def is_cacheable(result: Any) -> bool:
+    if not isinstance(result, dict):
+        return False
+    if "Error!" in result:
+        return False
+    if result.get("reasoning") == MISSING_RESULT_REASON:
+        return False
+    return result.get("classification") not in {"PARSE_ERROR", "ERROR"}
+
+def relabel(result: Dict[str, Any], feature_name: str, feature_description: str) -> Dict[str, Any]:
+    """
+    Copy of a cached result with its feature-identity fields set to the requesting feature:
+    a semantic-tier hit was stored for a different, near-identical feature.
+    """
+    result = dict(result)
+    result["input_feature_name"] = feature_name
+    if "input_feature_description" in result:
+        result["input_feature_description"] = feature_description
+    if "expanded_feature_name" in result:
+        result["expanded_feature_name"] = expand_terminology(feature_name)
+    if "expanded_feature_description" in result:
+        result["expanded_feature_description"] = expand_terminology(feature_description)
+    return result
+
+def cached(fn: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Decorator for classifier methods with signature (self, feature_name, feature_description).
+    Uses `self.model_name` so answers from different models never mix.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, feature_name: str, feature_description: str, *args, **kwargs):
+        model = getattr(self, "model_name", "")
+        payload, text = feature_request(model, feature_name, feature_description)
+        cache = get_cache()
+        hit = cache.get(payload, text=text, scope=model)
+        if hit is not None:
+            return relabel(hit, feature_name, feature_description)
+        result = fn(self, feature_name, feature_description, *args, **kwargs)
+        if is_cacheable(result):
+            cache.set(payload, result, text=text, scope=model)
+        return result
+    return wrapper
@@ -1,21 +1,50 @@
 from __future__ import annotations
+import functools
+import time
 from typing import Optional
 from google.generativeai.generative_models import GenerativeModel
 from google.generativeai.client import configure
+from src.utils.rate_limit import full_jitter_backoff, is_rate_limit_error, is_transient_error, retry_after_seconds
 
 class GeminiClient:
-    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash", timeout: float = 120.0,
+                 max_retries: int = 3):
         configure(api_key=api_key)
+        # enrichment prompts can carry a whole micro-batch, so the deadline is looser than per-feature calls
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.model_name = model_name
         self.model = GenerativeModel(model_name)
 
     def generate(self, prompt: str, safety_settings: Optional[dict] = None) -> str:
-        """Return raw text from Gemini; caller handles parsing."""
-        resp = self.model.generate_content(
-            contents=prompt,
-            generation_config={
-                "temperature": 0,
-                "top_p": 1,
-                "response_mime_type": "application/json"
-            }
-        )
-        return resp.text
\ No newline at end of file
+        """
+        Return raw text from Gemini; caller handles parsing. Not cached here: callers
+        cache only replies they have parsed and validated.
+        """
+        return self._generate_with_retry(prompt).text
+
+    def _generate_with_retry(self, prompt: str):
+        # 429s / transient errors retry with full-jitter backoff (or the server's retry hint),
+        # so parallel agent workers don't all retry at the same instant
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.model.generate_content(
+                    contents=prompt,
+                    generation_config={
+                        "temperature": 0,
+                        "top_p": 1,
+                        "response_mime_type": "application/json"
+                    },
+                    request_options={"timeout": self.timeout},
+                )
+            except Exception as e:
+                retryable = is_rate_limit_error(e) or is_transient_error(e)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                hinted = retry_after_seconds(e) if is_rate_limit_error(e) else None
+                time.sleep(hinted if hinted is not None else full_jitter_backoff(attempt))
+
+@functools.lru_cache(maxsize=None)
+def get_gemini_client(api_key: str, model_name: str = "gemini-2.5-flash") -> GeminiClient:
+    """One client per (key, model) per process, so repeated in-process pipeline runs skip re-init."""
+    return GeminiClient(api_key=api_key, model_name=model_name)
@@ -46,12 +46,19 @@ def demo_classifier():
     
     print("📋 Classifying demo features:\n")
     
-    for i, feature in enumerate(demo_features, 1):
+    # one batched request for all demo features instead of one round trip each
+    try:
+        results = classifier.classify_features_batch([
+            {"feature_name": f["name"], "feature_description": f["description"]} for f in demo_features
+        ])
+    except Exception as e:
+        results = [{"Error!": str(e)} for _ in demo_features]
+    
+    for i, (feature, result) in enumerate(zip(demo_features, results), 1):
         print(f"🔍 Feature {i}: {feature['name']}")
         print(f"   Description: {feature['description']}")
         
         try:
-            result = classifier.classify_feature(feature['name'], feature['description'])
             
             # Display results
             classification = result.get('classification', 'UNKNOWN')
@@ -1,24 +1,29 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, List
+import contextvars
+import csv
+import functools
 import json
 import pandas as pd
-import time, threading
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from src.agents.child_safety import ChildSafetyAgent
 from src.agents.privacy import PrivacyAgent
 from src.agents.moderation import ModerationAgent
 from src.agents.general import GeneralComplianceAgent
-from src.agents.base import AgentVerdict
+from src.agents.base import AgentVerdict, BaseAgent
+from src.utils.rate_limit import TokenBucket
+from src.utils.helpers import read_csv_fast
 
 # Optional: wire in your GeminiClient if you want LLM fallbacks
 try:
     from src.config.settings import get_settings
-    from src.llm.gemini_client import GeminiClient
+    from src.llm.gemini_client import get_gemini_client
 except Exception:
     get_settings = None
-    GeminiClient = None
+    get_gemini_client = None
 
 AGENT_REGISTRY = {
     "ChildSafetyAgent": ChildSafetyAgent,
@@ -27,6 +32,9 @@ AGENT_REGISTRY = {
     "GeneralComplianceAgent": GeneralComplianceAgent
 }
 
+AGENT_RESULT_COLUMNS = ["row_index", "agent", "status", "score", "reasoning",
+                        "suggestions", "domains", "regions", "feature_name"]
+
 def _to_list(v) -> List[str]:
     if isinstance(v, list):
         return v
@@ -58,22 +66,28 @@ class RateLimitedLLM:
         self.inner = inner_client
         self.min_interval = float(min_interval_sec)
         self.jitter = float(jitter_sec)
-        self._lock = threading.Lock()
-        self._last = 0.0
+        # global per-process pacing; worker threads queue on the bucket, not on each other
+        self._bucket = TokenBucket(rate=1.0 / self.min_interval) if self.min_interval > 0 else None
 
     def generate(self, prompt: str):
-        # Ensure at least min_interval between calls (global per-process)
-        with self._lock:
-            now = time.monotonic()
-            wait = (self._last + self.min_interval) - now
-            if wait > 0:
-                time.sleep(wait)
-            if self.jitter > 0.0:
-                time.sleep(min(self.jitter, 0.250))
-            self._last = time.monotonic()
+        # Ensure at least min_interval between calls (global per-process).
+        if self._bucket is not None:
+            self._bucket.acquire()
+        if self.jitter > 0.0:
+            time.sleep(min(self.jitter, 0.250))
         # delegate
         return self.inner.generate(prompt)
 
+@functools.lru_cache(maxsize=8)
+def _shared_llm(base_client, min_interval_sec: float, jitter_sec: float) -> RateLimitedLLM:
+    """One paced wrapper per client/settings, so in-process pipeline runs share a single budget."""
+    return RateLimitedLLM(base_client, min_interval_sec=min_interval_sec, jitter_sec=jitter_sec)
+
+@functools.lru_cache(maxsize=64)
+def _agent_instance(AgentCls, llm_client, use_llm: bool):
+    """Agents hold no per-row state (rule patterns are module-level), so tasks share instances."""
+    return AgentCls(llm=llm_client, llm_enabled=use_llm, llm_mode="always")
+
 # --- helper: one task per (row, agent) ---
 def _run_agent_task(idx, row, agent_name, llm_client, enable_llm_for_llm_categorized, enable_llm_for_all, AGENT_REGISTRY):
     from src.agents.base import AgentVerdict  # local import to avoid import cycles
@@ -109,7 +123,7 @@ def _run_agent_task(idx, row, agent_name, llm_client, enable_llm_for_llm_categor
     elif enable_llm_for_llm_categorized and llm_categorized:
         use_llm = True
 
-    agent = AgentCls(llm=llm_client, llm_enabled=use_llm, llm_mode="always")
+    agent = _agent_instance(AgentCls, llm_client, use_llm)
     verdict: AgentVerdict = agent.check(row)
 
     feature_name = (row.get("expanded_feature_name")
@@ -128,6 +142,32 @@ def _run_agent_task(idx, row, agent_name, llm_client, enable_llm_for_llm_categor
         "feature_name": feature_name,
     }
 
+def _for_row(res: Dict, idx, row) -> Dict:
+    """A shared agent result re-labelled for a duplicate row (same feature text)."""
+    return {**res, "row_index": idx,
+            "domains": row.get("final_domains"), "regions": row.get("final_primary_regions")}
+
+def _run_rules_only(df: pd.DataFrame, cols_out: Dict[str, List]) -> None:
+    """No LLM client: score each agent's routed rows in one check_batch() call instead of a task per row."""
+    routed: Dict[str, List] = {}
+    for idx, agent_names in zip(df.index, df["route_agents"] if "route_agents" in df else [[]] * len(df)):
+        agent_names = agent_names if isinstance(agent_names, list) else _to_list(agent_names)
+        for agent_name in agent_names:
+            if agent_name in AGENT_REGISTRY:
+                routed.setdefault(agent_name, []).append(idx)
+
+    for agent_name, idxs in routed.items():
+        rows = df.loc[idxs]
+        verdicts = AGENT_REGISTRY[agent_name]().check_batch(rows)
+        records = rows.to_dict("records")
+        cols_out["row_index"].extend(idxs)
+        for c in ("agent", "status", "score", "reasoning", "suggestions"):
+            cols_out[c].extend(verdicts[c].tolist())
+        cols_out["domains"].extend(r.get("final_domains") for r in records)
+        cols_out["regions"].extend(r.get("final_primary_regions") for r in records)
+        cols_out["feature_name"].extend(r.get("expanded_feature_name") or r.get("input_feature_name") or ""
+                                        for r in records)
+
 def main(in_csv: str | Path,
          out_csv: str | Path,
          enable_llm_for_llm_categorized: bool = True,
@@ -135,43 +175,76 @@ def main(in_csv: str | Path,
          max_workers: int = 8,
          min_llm_interval_sec: float = 1.0,
          llm_jitter_sec: float = 0.0):
-    df = pd.read_csv(in_csv)
+    df = read_csv_fast(in_csv)
 
     # optional LLM client
     llm_client = None
     want_llm = (enable_llm_for_all or enable_llm_for_llm_categorized)
-    if want_llm and get_settings and GeminiClient:
+    if want_llm and get_settings and get_gemini_client:
         st = get_settings()
-        base_client = GeminiClient(api_key=st.gemini_api_key, model_name=st.gemini_model)
+        base_client = get_gemini_client(st.gemini_api_key, st.gemini_model)
         # wrap with global rate limiter: at most 1 request/sec
-        llm_client = RateLimitedLLM(base_client, min_interval_sec=min_llm_interval_sec, jitter_sec=llm_jitter_sec)
+        llm_client = _shared_llm(base_client, float(min_llm_interval_sec), float(llm_jitter_sec))
 
     tasks = []
-    rows_out: List[Dict] = []
+    # rows whose (agent, feature text, LLM eligibility) repeats an earlier row reuse its run
+    followers: Dict[tuple, List] = {}
+    key_of: Dict = {}
+    # column-wise buffers (one list per output column) -> a single DataFrame build at the end
+    cols_out: Dict[str, List] = {c: [] for c in AGENT_RESULT_COLUMNS}
+
+    out_path = Path(out_csv)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if llm_client is None:
+        _run_rules_only(df, cols_out)
+        results_df = pd.DataFrame(cols_out).sort_values(["row_index", "agent"], kind="stable")
+        results_df.to_csv(out_path, index=False)
+        print(f"Wrote agent results → {out_path}")
+        return
+
+    # completion-order results land on disk as they finish (crash-safe, pollable);
+    # the sorted file replaces it once every task is done
+    partial_path = out_path.with_suffix(".partial.csv")
 
     # fan out tasks
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        for idx, row in df.iterrows():
+    with ThreadPoolExecutor(max_workers=max_workers) as ex, \
+            open(partial_path, "w", newline="", encoding="utf-8") as partial_f:
+        partial = csv.DictWriter(partial_f, fieldnames=AGENT_RESULT_COLUMNS)
+        partial.writeheader()
+        # plain dicts instead of a boxed Series per row (agents only use row.get)
+        for idx, row in zip(df.index, df.to_dict("records")):
             agent_names = row.get("route_agents", [])
             # robust list coercion (reuse your helper)
             agent_names = agent_names if isinstance(agent_names, list) else _to_list(agent_names)
             for agent_name in agent_names:
-                tasks.append(ex.submit(
-                    _run_agent_task, idx, row, agent_name,
+                key = (agent_name, BaseAgent.text(row), bool(_to_list(row.get("llm_domains", []))))
+                if key in followers:
+                    followers[key].append((idx, row))
+                    continue
+                followers[key] = []
+                # copied context: the caller's cache intent reaches llm_json in the worker
+                fut = ex.submit(
+                    contextvars.copy_context().run, _run_agent_task, idx, row, agent_name,
                     llm_client, enable_llm_for_llm_categorized, enable_llm_for_all, AGENT_REGISTRY
-                ))
+                )
+                key_of[fut] = key
+                tasks.append(fut)
 
         for fut in as_completed(tasks):
             res = fut.result()
             if res is not None:
-                rows_out.append(res)
+                for r in [res] + [_for_row(res, i, row) for i, row in followers[key_of[fut]]]:
+                    for c in AGENT_RESULT_COLUMNS:
+                        cols_out[c].append(r[c])
+                    partial.writerow(r)
+                partial_f.flush()
 
     # stable ordering for reproducible diffs
-    rows_out.sort(key=lambda r: (r["row_index"], r["agent"]))
+    results_df = pd.DataFrame(cols_out).sort_values(["row_index", "agent"], kind="stable")
 
-    out_path = Path(out_csv)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    pd.DataFrame(rows_out).to_csv(out_path, index=False)
+    results_df.to_csv(out_path, index=False)
+    partial_path.unlink(missing_ok=True)
     print(f"Wrote agent results → {out_path}")
 
 if __name__ == "__main__":
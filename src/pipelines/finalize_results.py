@@ -3,14 +3,20 @@ import os
 from pathlib import Path
 from typing import List, Dict, Any
 import argparse
+import functools
 import json
 import ast
+import numpy as np
 import pandas as pd
+from src.utils.helpers import read_csv_fast
 
 from dotenv import load_dotenv
 import hashlib
 import zipfile
+import threading
+import time
 from datetime import datetime
+import requests
 from web3 import Web3
 
 IN_ENRICHED_DEFAULT = "outputs/llm_enriched.csv"
@@ -54,13 +60,13 @@ def collapse_reasoning(agent_rows: pd.DataFrame) -> str:
     for label in ("ISSUE", "REVIEW"):
         sub = agent_rows[agent_rows["status"] == label]
         if not sub.empty:
-            names = ", ".join(f"{r['agent']}({r.get('score',0):.2f})" for _, r in sub.iterrows())
+            names = ", ".join(f"{r['agent']}({r.get('score',0):.2f})" for r in sub.to_dict("records"))
             parts.append(f"{label}: {names}")
     if not parts:
         parts.append("All assigned agents returned OK.")
     # Add the first non-empty textual reasoning for color (optional)
-    for _, r in agent_rows.iterrows():
-        rr = str(r.get("reasoning") or "").strip()
+    for reasoning in agent_rows["reasoning"].tolist() if "reasoning" in agent_rows.columns else []:
+        rr = str(reasoning or "").strip()
         if rr:
             parts.append(rr)
             break
@@ -68,37 +74,78 @@ def collapse_reasoning(agent_rows: pd.DataFrame) -> str:
     text = " | ".join(parts)
     return (text[:600] + "…") if len(text) > 600 else text
 
-def pick_final_class(agent_rows: pd.DataFrame) -> str:
-    if (agent_rows["status"] == "ISSUE").any():
-        return "REQUIRED"
-    if (agent_rows["status"] == "REVIEW").any():
-        return "NEEDS HUMAN REVIEW"
-    return "NOT REQUIRED"
-
-def compute_confidence(agent_rows: pd.DataFrame, final_class: str) -> float:
-    # scores are 0..1 provided by agents
-    if agent_rows.empty:
-        return 0.5
-    if final_class == "REQUIRED":
-        # strongest indicator
-        scores = agent_rows.loc[agent_rows["status"] == "ISSUE", "score"].dropna().astype(float)
-        return float(scores.max() if not scores.empty else 0.75)
-    if final_class == "NEEDS HUMAN REVIEW":
-        scores = agent_rows.loc[agent_rows["status"] == "REVIEW", "score"].dropna().astype(float)
-        if scores.empty:
-            # borderline with no scores recorded
-            return 0.6
-        return float(scores.mean())
-    # NOT REQUIRED
-    return 0.9
-
-def hash(filename, algorithm='sha256') -> str:
-        """Generate a hash for a file."""
-        hash_obj = hashlib.new(algorithm)
-        with open(filename, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
-        return hash_obj.hexdigest()
+def decide_all(ag: pd.DataFrame) -> pd.DataFrame:
+    """
+    Final class + confidence for every row_index from one grouped aggregation
+    (instead of re-filtering each feature's agent rows several times):
+      - any ISSUE  -> REQUIRED, confidence = max ISSUE score (0.75 if none recorded)
+      - any REVIEW -> NEEDS HUMAN REVIEW, confidence = mean REVIEW score (0.6 if none)
+      - otherwise  -> NOT REQUIRED, confidence 0.9
+    """
+    status = ag["status"]
+    is_issue = status.eq("ISSUE")
+    is_review = status.eq("REVIEW")
+    score = pd.to_numeric(ag["score"], errors="coerce")  # scores are 0..1 provided by agents
+    g = pd.DataFrame({
+        "row_index": ag["row_index"].astype(int),
+        "issue": is_issue,
+        "review": is_review,
+        "issue_score": score.where(is_issue),
+        "review_score": score.where(is_review),
+    }).groupby("row_index").agg(
+        issue=("issue", "any"),
+        review=("review", "any"),
+        issue_max=("issue_score", "max"),
+        review_mean=("review_score", "mean"),
+    )
+    final_class = np.select([g["issue"], g["review"]], ["REQUIRED", "NEEDS HUMAN REVIEW"], "NOT REQUIRED")
+    confidence = np.where(g["issue"], g["issue_max"].fillna(0.75),
+                          np.where(g["review"], g["review_mean"].fillna(0.6), 0.9))
+    return pd.DataFrame({"final_class": final_class, "confidence": confidence}, index=g.index)
+
+@functools.lru_cache(maxsize=4)
+def _chain_session(rpc_url: str, private_key: str):
+    """(Web3, account) per RPC endpoint/key, built once per process."""
+    w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 10}))
+    return w3, w3.eth.account.from_key(private_key)
+
+# next nonce per sender address, tracked locally after the first RPC lookup
+_NEXT_NONCE: Dict[str, int] = {}
+# guards _NEXT_NONCE and _FEE_CACHE; pipelines from the Slack bot and the app share this process
+_CHAIN_STATE_LOCK = threading.Lock()
+# one on-chain log at a time: the balance check must see the previous run's spend
+_ONCHAIN_LOCK = threading.Lock()
+
+SEPOLIA_CHAIN_ID = 11155111
+FEE_CACHE_TTL_SEC = 60.0
+# rpc_url -> (fetched_at, maxFeePerGas, maxPriorityFeePerGas)
+_FEE_CACHE: Dict[str, tuple] = {}
+
+def _fee_caps(w3, rpc_url: str) -> tuple:
+    """EIP-1559 (maxFeePerGas, maxPriorityFeePerGas) from eth_feeHistory, refreshed at most once a minute."""
+    with _CHAIN_STATE_LOCK:
+        cached = _FEE_CACHE.get(rpc_url)
+        if cached and time.monotonic() - cached[0] < FEE_CACHE_TTL_SEC:
+            return cached[1], cached[2]
+        hist = w3.eth.fee_history(5, 'latest', [50])
+        tips = sorted(r[0] for r in hist['reward'] if r) or [w3.to_wei(1, 'gwei')]
+        tip = tips[len(tips) // 2]
+        # baseFeePerGas[-1] is the next block's base fee; 2x covers several full blocks of increases
+        max_fee = 2 * hist['baseFeePerGas'][-1] + tip
+        _FEE_CACHE[rpc_url] = (time.monotonic(), max_fee, tip)
+        return max_fee, tip
+
+GAS_BUFFER = 1000
+
+def _intrinsic_gas(data: bytes) -> int:
+    """
+    Intrinsic gas of a plain transfer carrying `data`: the larger of the standard calldata
+    cost (16/4 gas per non-zero/zero byte) and the EIP-7623 floor (10 gas per token,
+    a non-zero byte counting as 4 tokens), which applies since Pectra.
+    """
+    nonzero = sum(1 for b in data if b)
+    zero = len(data) - nonzero
+    return max(21000 + 16 * nonzero + 4 * zero, 21000 + 10 * (zero + 4 * nonzero))
 
 def log_on_chain(hash_value: str) -> str:
         """
@@ -125,21 +172,20 @@ def log_on_chain(hash_value: str) -> str:
                 case 'infura':
                     rpc_url = f"https://sepolia.infura.io/v3/{api_key}"
                 
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
-            if not w3.is_connected():
+            w3, acct = _chain_session(rpc_url, private_key)
+            # no is_connected() probe: the first real RPC surfaces a connection problem
+            try:
+                balance = w3.eth.get_balance(acct.address)
+                max_fee, tip = _fee_caps(w3, rpc_url)
+            except (ConnectionError, requests.RequestException):
                 print("Failed to connect to Ethereum network, check your API provider and key.\nSupported providers: alchemy, infura")
                 return ''
-
-            acct = w3.eth.account.from_key(private_key)
-            balance = w3.eth.get_balance(acct.address)
             balance_eth = w3.from_wei(balance, 'ether')
 
-            data_bytes = len(hash_value) // 2  # Each hex pair = 1 byte
-            gas_for_data = data_bytes * 16  # 16 gas per non-zero byte (assuming worst case)
-            estimated_gas = 21000 + gas_for_data + 1000  # Base + data + buffer
+            # a plain self-send with calldata has a fixed cost, so no estimate_gas round trip
+            estimated_gas = _intrinsic_gas(bytes.fromhex(hash_value)) + GAS_BUFFER
 
-            gas_price = w3.eth.gas_price
-            estimated_cost = w3.from_wei(gas_price * estimated_gas, 'ether')
+            estimated_cost = w3.from_wei(max_fee * estimated_gas, 'ether')
             
             if balance_eth < estimated_cost:
                 print(f"Insufficient funds: {balance_eth} ETH (need ~{estimated_cost} ETH)")
@@ -149,28 +195,57 @@ def log_on_chain(hash_value: str) -> str:
                 "to": acct.address,  # Self-send to embed data
                 "value": 0,          
                 "gas": estimated_gas,        
-                "gasPrice": gas_price,
-                "nonce": w3.eth.get_transaction_count(acct.address),
+                "maxFeePerGas": max_fee,
+                "maxPriorityFeePerGas": tip,
+                "chainId": SEPOLIA_CHAIN_ID,
                 "data": "0x" + hash_value  # Embed hash in transaction data
             }
 
-            try:
-                estimated_gas_web3 = w3.eth.estimate_gas(tx)
-                tx["gas"] = estimated_gas_web3
-                
-                signed = acct.sign_transaction(tx)
-                tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-                tx_hash_str = f"0x{tx_hash.hex()}"
-                print(f"Hash log transaction successful!")
-                return tx_hash_str
-
-            except Exception as e:
-                print(f"Hash log transaction failed: {e}")
-                return ''
+            # nonce read, send and increment as one step, so concurrent runs never reuse a nonce
+            with _CHAIN_STATE_LOCK:
+                try:
+                    nonce = _NEXT_NONCE.get(acct.address)
+                    if nonce is None:
+                        nonce = w3.eth.get_transaction_count(acct.address)
+                    tx["nonce"] = nonce
+                    signed = acct.sign_transaction(tx)
+                    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+                    tx_hash_str = f"0x{tx_hash.hex()}"
+                    _NEXT_NONCE[acct.address] = nonce + 1
+                    print(f"Hash log transaction successful!")
+                    return tx_hash_str
+
+                except Exception as e:
+                    if "nonce" in str(e).lower():
+                        # local nonce drifted (e.g. another sender); re-sync from the node next time
+                        _NEXT_NONCE.pop(acct.address, None)
+                    print(f"Hash log transaction failed: {e}")
+                    return ''
         else:
             print("Hash log transaction skipped (Missing required environment variables)")
             return ''
 
+class _HashingWriter:
+    """
+    Write-only, non-seekable file wrapper that SHA-256s every byte on its way to disk.
+    ZipFile falls back to streaming mode (data descriptors, no seek-back) for it, so
+    the digest covers exactly the bytes of the finished archive.
+    """
+
+    def __init__(self, f) -> None:
+        self._f = f
+        self._h = hashlib.sha256()
+
+    def write(self, b) -> int:
+        self._h.update(b)
+        return self._f.write(b)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
 def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
     # Get the directory of the output CSV
     output_dir = in_final.parent
@@ -193,7 +268,10 @@ def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
 
     try:
         # Create zip archive with existing files
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
+        # fast deflate: the CSVs shrink several-fold for little CPU
+        # the zip is hashed as it is written, so it never has to be read back
+        with open(zip_path, 'wb') as raw, zipfile.ZipFile(
+                hashing := _HashingWriter(raw), 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
             
             for file_path in files_to_include:
                 file_obj = Path(file_path)
@@ -201,7 +279,9 @@ def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
                 # Check if file exists (either absolute path or relative to output dir)
                 if file_obj.exists():
                     zipf.write(file_obj, arcname=file_obj.name)
-                    file_obj.unlink()
+                    # keep final_results.csv on disk so the app can render/download it
+                    if file_obj != Path(in_final):
+                        file_obj.unlink()
 
             for dir_path in directories_to_include:
                 dir_obj = Path(dir_path)
@@ -220,7 +300,7 @@ def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
     # Create hash file for the zip
     hash_filename = f"{zip_filename}.hash"
     hash_path = output_dir / hash_filename
-    hash_value = hash(zip_path)
+    hash_value = hashing.hexdigest()
     try:
         with open(hash_path, 'w') as hash_file:
             hash_file.write(f"Hash: {hash_value}\n")
@@ -231,7 +311,8 @@ def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
         return None
     
     try:
-        tx_id = log_on_chain(hash_value)
+        with _ONCHAIN_LOCK:
+            tx_id = log_on_chain(hash_value)
         if tx_id != '':
             with open(hash_path, 'a') as f:
                 f.write(f"View on Etherscan: https://sepolia.etherscan.io/tx/{tx_id}\n")
@@ -239,10 +320,84 @@ def generate_report(in_enriched: Path, in_agents: Path, in_final: Path):
         print(f"Failed to log transaction on-chain: {e}")
         return None
 
+# ----------------- output -----------------
+FINAL_COLUMNS = ["feature", "description", "domain", "primary region", "regulation hits",
+                 "clear reasoning", "confidence", "Final Classification"]
+FINAL_FLUSH_ROWS = 5000
+
+class _FinalWriter:
+    """
+    Streams result records to the final CSV in batches of FINAL_FLUSH_ROWS, plus a
+    Parquet copy next to it when pyarrow is installed. Only one batch is held in memory.
+    With pyarrow, each batch becomes one Arrow record batch that feeds both pyarrow's C++ CSV
+    writer and the Parquet writer; otherwise pandas' to_csv appends the batch.
+    """
+
+    def __init__(self, out_csv: Path) -> None:
+        self.out_csv = out_csv
+        self.out_parquet = out_csv.with_suffix(".parquet")
+        # column-wise batch buffer: one list per output column
+        self._cols: Dict[str, List[Any]] = {c: [] for c in FINAL_COLUMNS}
+        self._n = 0
+        self._wrote_header = False
+        self._pq_writer = None
+        self._csv_writer = None
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+            import pyarrow.parquet as pq
+            self._pa = pa
+            self._schema = pa.schema([(c, pa.float64() if c == "confidence" else pa.string())
+                                      for c in FINAL_COLUMNS])
+            self._pq_writer = pq.ParquetWriter(str(self.out_parquet), self._schema)
+            self._csv_writer = pacsv.CSVWriter(str(self.out_csv), self._schema)  # writes the header
+        except ImportError:
+            pass
+
+    def _arrow_values(self, col: str) -> List[Any]:
+        values = self._cols[col]
+        if col == "confidence":
+            return values
+        # NaN (v != v) -> null; anything else non-string is stringified for the string columns
+        return [v if v is None or isinstance(v, str) or v != v else str(v) for v in values]
+
+    def add(self, record: Dict[str, Any]) -> None:
+        for c in FINAL_COLUMNS:
+            self._cols[c].append(record.get(c))
+        self._n += 1
+        if self._n >= FINAL_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._csv_writer is not None:
+            if self._n:
+                # lists -> Arrow arrays directly, no intermediate object-dtype DataFrame;
+                # from_pandas=True maps NaN cells to nulls
+                batch = self._pa.RecordBatch.from_arrays(
+                    [self._pa.array(self._arrow_values(f.name), type=f.type, from_pandas=True)
+                     for f in self._schema],
+                    schema=self._schema,
+                )
+                self._csv_writer.write_batch(batch)
+                self._pq_writer.write_batch(batch)
+        elif self._n or not self._wrote_header:
+            df = pd.DataFrame(self._cols).astype({"confidence": "float64"})
+            df.to_csv(self.out_csv, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+        self._cols = {c: [] for c in FINAL_COLUMNS}
+        self._n = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._csv_writer is not None:
+            self._csv_writer.close()
+            self._pq_writer.close()
+
 # ----------------- main -----------------
 def finalize(in_enriched: str, in_agents: str, out_csv: str):
-    enr = pd.read_csv(in_enriched)
-    ag = pd.read_csv(in_agents)
+    enr = read_csv_fast(in_enriched)
+    ag = read_csv_fast(in_agents)
 
     # Ensure required columns exist
     for col in ["route_agents", "final_domains", "final_primary_regions", "final_related_regulations",
@@ -256,9 +411,13 @@ def finalize(in_enriched: str, in_agents: str, out_csv: str):
         raise ValueError("agent_results.csv must contain 'row_index' produced by agent_runner.")
 
     grouped: Dict[int, pd.DataFrame] = {int(k): v for k, v in ag.groupby("row_index")}
+    decisions = decide_all(ag).to_dict("index") if not ag.empty else {}
 
-    records: List[Dict[str, Any]] = []
-    for idx, row in enr.iterrows():
+    out_path = Path(out_csv)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    writer = _FinalWriter(out_path)
+    # row dicts are much cheaper than iterrows() Series and support the same .get access
+    for idx, row in zip(enr.index, enr.to_dict("records")):
         feature = row.get("expanded_feature_name") or row.get("input_feature_name") or ""
         desc    = row.get("expanded_feature_description") or row.get("input_feature_description") or ""
 
@@ -281,11 +440,12 @@ def finalize(in_enriched: str, in_agents: str, out_csv: str):
             reasoning   = f"Prescan hard hits. {prescan_rationale or 'Law/domain cues detected.'}"
         else:
             # existing path
-            final_class = pick_final_class(agents_df)
-            confidence  = round(compute_confidence(agents_df, final_class), 2)
+            decision    = decisions.get(int(idx), {"final_class": "NOT REQUIRED", "confidence": 0.5})
+            final_class = decision["final_class"]
+            confidence  = round(float(decision["confidence"]), 2)
             reasoning   = collapse_reasoning(agents_df)
 
-        records.append({
+        writer.add({
             "feature": feature,
             "description": desc,
             "domain": ", ".join(domains) if domains else "",
@@ -296,9 +456,7 @@ def finalize(in_enriched: str, in_agents: str, out_csv: str):
             "Final Classification": final_class,
         })
 
-    out_path = Path(out_csv)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    pd.DataFrame(records).to_csv(out_path, index=False)
+    writer.close()
     generate_report(in_enriched, in_agents, out_path)
 
 if __name__ == "__main__":
@@ -4,11 +4,13 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 import pandas as pd
 
+from src.cache.llm_cache import get_cache
 from src.config.settings import get_settings
-from src.llm.gemini_client import GeminiClient
+from src.llm.gemini_client import get_gemini_client
 from src.prompts.enrichment_master import build_master_prompt
-from src.utils.json_parser import strict_json_array
+from src.utils.json_parser import dumps_json, strict_json_array
 from src.utils.merge import merge_prescan_llm
+from src.utils.helpers import read_csv_fast
 
 def _to_list(v):
     if isinstance(v, list):
@@ -30,7 +32,7 @@ def enrich_ambiguous_with_llm(
     Keep feature_index as original df index so we can merge cleanly.
     """
     prescan_csv = Path(prescan_csv)
-    df = pd.read_csv(prescan_csv)
+    df = read_csv_fast(prescan_csv)
 
     needed = [
         "input_feature_name","input_feature_description",
@@ -49,23 +51,29 @@ def enrich_ambiguous_with_llm(
 
     # Prepare LLM inputs ONLY for ambiguous rows (use expanded fields if present)
     items: List[Dict[str, Any]] = []
-    for idx, r in amb_df.iterrows():
+    for idx, r in zip(amb_df.index, amb_df.to_dict("records")):
         name = r.get("expanded_feature_name") or r.get("input_feature_name") or ""
         desc = r.get("expanded_feature_description") or r.get("input_feature_description") or ""
         items.append({"index": int(idx), "name": str(name), "desc": str(desc)})
 
     settings = get_settings()
-    client = GeminiClient(api_key=settings.gemini_api_key, model_name=settings.gemini_model)
+    client = get_gemini_client(settings.gemini_api_key, settings.gemini_model)
 
     if items:
         prompt = build_master_prompt(items)
-        raw_text = client.generate(prompt)
-        try:
-            arr = strict_json_array(raw_text)
-        except Exception as e:
-            dump_path = prescan_csv.parent / "llm_raw_response.txt"
-            dump_path.write_text(raw_text, encoding="utf-8")
-            raise RuntimeError(f"LLM response parsing failed: {e}. Raw text saved to {dump_path}")
+        # exact-match cache of the parsed answer (a reply that fails to parse is never stored)
+        cache = get_cache()
+        payload = {"prompt": prompt, "model": client.model_name}
+        arr = cache.get(payload)
+        if not isinstance(arr, list):
+            raw_text = client.generate(prompt)
+            try:
+                arr = strict_json_array(raw_text)
+            except Exception as e:
+                dump_path = prescan_csv.parent / "llm_raw_response.txt"
+                dump_path.write_text(raw_text, encoding="utf-8")
+                raise RuntimeError(f"LLM response parsing failed: {e}. Raw text saved to {dump_path}")
+            cache.set(payload, arr)
         by_index: Dict[int, Dict[str, Any]] = {
             obj.get("feature_index"): obj for obj in arr if isinstance(obj.get("feature_index"), int)
         }
@@ -84,7 +92,7 @@ def enrich_ambiguous_with_llm(
             df[c] = None
 
     # Merge: for ambiguous rows use LLM+prescan; otherwise carry prescan forward
-    for idx, row in df.iterrows():
+    for idx, row in zip(df.index, df.to_dict("records")):
         if idx in by_index:
             merged = merge_prescan_llm(row, by_index[idx], settings.confidence_downgrade_guard)
         else:
@@ -117,7 +125,7 @@ def enrich_ambiguous_with_llm(
                      "final_domains","final_primary_regions","final_related_regulations"]
         to_write = df.copy()
         for c in list_cols:
-            to_write[c] = to_write[c].apply(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, list) else (v if v is not None else "[]"))
+            to_write[c] = [dumps_json(v) if isinstance(v, list) else (v if v is not None else "[]") for v in to_write[c]]
         to_write.to_csv(out_csv, index=False)
         print(f"Wrote enriched results → {out_csv}")
 
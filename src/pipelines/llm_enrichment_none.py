@@ -1,15 +1,20 @@
 from __future__ import annotations
+import contextvars
 import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from src.cache.llm_cache import get_cache
 from src.config.settings import get_settings
-from src.llm.gemini_client import GeminiClient
+from src.llm.gemini_client import get_gemini_client
 from src.prompts.enrichment_master import build_master_prompt
-from src.utils.json_parser import strict_json_array
+from src.utils.json_parser import dumps_json, strict_json_array
 from src.utils.merge import merge_prescan_llm
 from src.utils.merge import merge_categories_only
+from src.utils.rate_limit import TokenBucket
+from src.utils.helpers import read_csv_fast
 
 # --- helpers ------------------------------------------------------------
 def _to_list(v):
@@ -28,22 +33,31 @@ def _make_join_key(df: pd.DataFrame) -> pd.Series:
     desc = df.get("expanded_feature_description", df.get("input_feature_description")).fillna("")
     return (name.astype(str) + "||" + desc.astype(str)).astype(str)
 
+def _dedup_key(name: Any, desc: Any) -> str:
+    # case/whitespace-insensitive identity of a feature for LLM dispatch
+    return f"{str(name).strip().lower()}\x1f{str(desc).strip().lower()}"
+
 # --- main ---------------------------------------------------------------
 def enrich_none_only(
     prescan_csv: str | Path,
     none_csv: str | Path,
     out_csv: Optional[str | Path] = None,
+    batch_size: Optional[int] = None,
+    workers: int = 1,
+    min_interval: float = 0.0,
 ) -> pd.DataFrame:
     """
     Load full prescan results + the by_domain/domain__NONE.csv,
     call LLM ONLY for those 'NONE' rows, merge results back,
     and write an enriched CSV.
+    batch_size: features per LLM call (None = all NONE rows in a single call).
+    workers / min_interval: concurrent LLM calls and minimum seconds between call starts.
     """
     prescan_csv = Path(prescan_csv)
     none_csv = Path(none_csv)
 
-    df_all = pd.read_csv(prescan_csv)
-    df_none = pd.read_csv(none_csv)
+    df_all = read_csv_fast(prescan_csv)
+    df_none = read_csv_fast(none_csv)
 
     # Validate required columns that prescan produces
     needed = [
@@ -70,21 +84,45 @@ def enrich_none_only(
         none_keys = set(df_none["_join_key"].tolist())
         target_idx = df_all.index[df_all["_join_key"].isin(none_keys)].tolist()
 
-    # Build items for LLM from the subset only
+    # Build items for LLM from the subset only.
+    # Identical (name, desc) pairs are sent once; duplicates reuse the first row's answer.
     items: List[Dict[str, Any]] = []
-    for idx in target_idx:
-        r = df_all.loc[idx]
+    first_by_key: Dict[str, int] = {}
+    duplicates: Dict[int, List[int]] = {}
+    for idx, r in zip(target_idx, df_all.loc[target_idx].to_dict("records")):
         name = r.get("expanded_feature_name") or r.get("input_feature_name") or ""
         desc = r.get("expanded_feature_description") or r.get("input_feature_description") or ""
+        dedup_key = _dedup_key(name, desc)
+        if dedup_key in first_by_key:
+            duplicates[first_by_key[dedup_key]].append(int(idx))
+            continue
+        first_by_key[dedup_key] = int(idx)
+        duplicates[int(idx)] = []
         items.append({"index": int(idx), "name": str(name), "desc": str(desc)})
+    n_dupes = len(target_idx) - len(items)
+    if n_dupes:
+        print(f"Skipping {n_dupes} duplicate NONE rows (same name + description)")
 
-    # Call Gemini once for the subset (classification-only contract)
+    # Call Gemini for the subset in micro-batches (classification-only contract).
+    # FEATURE_INDEX carries the global row index, so chunks merge back without renumbering.
     settings = get_settings()
-    client = GeminiClient(api_key=settings.gemini_api_key, model_name=settings.gemini_model)
-
-    by_index: Dict[int, Dict[str, Any]] = {}
-    if items:
-        prompt = build_master_prompt(items)
+    client = get_gemini_client(settings.gemini_api_key, settings.gemini_model)
+
+    # Chunks run on a small thread pool paced by a token bucket, so each call's
+    # round trip overlaps with the pacing delay of the next instead of adding to it.
+    bucket = TokenBucket(rate=1.0 / min_interval) if min_interval and min_interval > 0 else None
+
+    # exact-match cache of parsed answers: re-runs of the same CSV skip the round trip
+    cache = get_cache()
+
+    def _call(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        prompt = build_master_prompt(chunk)
+        payload = {"prompt": prompt, "model": client.model_name}
+        hit = cache.get(payload)
+        if isinstance(hit, list):
+            return hit
+        if bucket is not None:
+            bucket.acquire()
         raw_text = client.generate(prompt)
         try:
             arr = strict_json_array(raw_text)
@@ -92,7 +130,27 @@ def enrich_none_only(
             dump_path = prescan_csv.parent / "llm_raw_response.txt"
             dump_path.write_text(raw_text, encoding="utf-8")
             raise RuntimeError(f"LLM response parsing failed: {e}. Raw text saved to {dump_path}")
-        by_index = {obj.get("feature_index"): obj for obj in arr if isinstance(obj.get("feature_index"), int)}
+        cache.set(payload, arr)
+        return arr
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    step = batch_size if batch_size and batch_size > 0 else max(len(items), 1)
+    chunks = [items[start:start + step] for start in range(0, len(items), step)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks) or 1))) as ex:
+        # each call runs in a copy of this context, so the caller's cache intent applies
+        futures = {ex.submit(contextvars.copy_context().run, _call, chunk): len(chunk) for chunk in chunks}
+        for fut in as_completed(futures):
+            arr = fut.result()
+            by_index.update({obj.get("feature_index"): obj for obj in arr if isinstance(obj.get("feature_index"), int)})
+            done += futures[fut]
+            print(f"Enriched {done}/{len(items)} NONE rows")
+
+    # Fan answers back out to duplicate rows
+    for first_idx, dupe_idxs in duplicates.items():
+        if first_idx in by_index:
+            for d in dupe_idxs:
+                by_index[d] = by_index[first_idx]
 
     # Ensure destination columns exist
     new_cols = [
@@ -104,7 +162,7 @@ def enrich_none_only(
             df_all[c] = None
 
     # Merge LLM categories for NONE rows; carry prescan forward for others if still empty
-    for idx, row in df_all.iterrows():
+    for idx, row in zip(df_all.index, df_all.to_dict("records")):
         if idx in by_index:
             merged = merge_categories_only(row, by_index[idx])   # <-- category-only merge
         else:
@@ -131,7 +189,7 @@ def enrich_none_only(
                      "final_domains","final_primary_regions","final_related_regulations"]
         to_write = df_all.copy()
         for c in list_cols:
-            to_write[c] = to_write[c].apply(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, list) else (v if v is not None else "[]"))
+            to_write[c] = [dumps_json(v) if isinstance(v, list) else (v if v is not None else "[]") for v in to_write[c]]
         to_write.to_csv(out_csv, index=False)
         print(f"Wrote enriched results → {out_csv}")
 
@@ -152,5 +210,11 @@ if __name__ == "__main__":
     p.add_argument("--prescan", required=True, help="Path to prescan_results.csv")
     p.add_argument("--none", required=True, help="Path to by_domain/domain__NONE.csv")
     p.add_argument("--out", required=True, help="Output CSV path")
+    p.add_argument("--batch-size", type=int, default=None,
+                   help="Features per LLM call (default: all NONE rows in one call)")
+    p.add_argument("--workers", type=int, default=1, help="Concurrent LLM calls (default 1)")
+    p.add_argument("--llm-min-interval", type=float, default=0.0,
+                   help="Minimum seconds between LLM call starts (default 0 = unpaced)")
     args = p.parse_args()
-    enrich_none_only(args.prescan, args.none, args.out)
+    enrich_none_only(args.prescan, args.none, args.out, batch_size=args.batch_size,
+                     workers=args.workers, min_interval=args.llm_min_interval)
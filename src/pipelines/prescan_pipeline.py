@@ -1,18 +1,19 @@
 # src/tools/prescan_pipeline.py
 from __future__ import annotations
-import json
+import sys
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 import pandas as pd
 
 # Import your existing helpers
 from src.processors.text_preprocessor import expand_terminology  # uses optional terminology arg
 from src.processors.prescan import prescan         # deterministic classifier
+from src.utils.json_parser import dumps_json, load_json_file
+from src.utils.helpers import prefetch
 
 def load_terminology_json(path: str | Path) -> Dict[str, str]:
     """Load a terminology mapping JSON: { "ASL": "Age Sensitive Logic", ... }."""
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json_file(path)
 
 def expand_fields(name: str, desc: str, terminology: Dict[str, str]) -> tuple[str, str, str]:
     """Return (merged_original, expanded_name, expanded_desc)."""
@@ -22,41 +23,119 @@ def expand_fields(name: str, desc: str, terminology: Dict[str, str]) -> tuple[st
     merged = f"{exp_name}\n{exp_desc}".strip()
     return merged, exp_name, exp_desc
 
+PRESCAN_CHUNK_ROWS = 1024
+PRESCAN_BLOCK_BYTES = 8 << 20  # pyarrow streaming reader block size
+REQUIRED_COLS = ["feature_name", "feature_description"]
+JSON_COLS = ["prescan_domains", "prescan_primary_regions", "prescan_law_hits", "prescan_keyword_hits"]
+
 def process_csv_with_prescan(
     input_csv: str | Path,
     terminology_json: str | Path,
     out_csv: Optional[str | Path] = None,
     split_by_domain_dir: Optional[str | Path] = None,
+    keep_results: bool = True,
 ) -> pd.DataFrame:
     """
     Read CSV -> expand terminology -> prescan -> organize.
+    The input is read PRESCAN_CHUNK_ROWS rows at a time and each chunk is appended to the
+    outputs as soon as it is processed.
 
     Args:
         input_csv: path to CSV with columns: feature_name, feature_description
+                   ("-" reads the CSV from stdin, so callers can skip a temp file;
+                   a binary file object is read as-is)
         terminology_json: path to JSON terminology map
         out_csv: optional path to write consolidated results
         split_by_domain_dir: optional folder to write one CSV per domain
+        keep_results: False returns an empty frame, so memory stays bounded by one chunk
 
     Returns:
         Pandas DataFrame of results (one row per input feature).
     """
-    input_csv = Path(input_csv)
-    terminology_json = Path(terminology_json)
-
     # 1) Load inputs
-    df = pd.read_csv(input_csv)
-    required_cols = ["feature_name", "feature_description"]
-    missing = [c for c in required_cols if c not in df.columns]
+    if hasattr(input_csv, "read"):
+        source = input_csv
+    else:
+        source = sys.stdin.buffer if str(input_csv) == "-" else Path(input_csv)
+    terminology = load_terminology_json(terminology_json)
+    written: set = set()
+    kept: List[pd.DataFrame] = []
+    # the next block is parsed in the background while this one is prescanned
+    for names, descs in prefetch(_iter_feature_columns(source)):
+        results = _prescan_rows(names, descs, terminology)
+        _write_outputs(results, out_csv, split_by_domain_dir, written)
+        if keep_results:
+            kept.append(results)
+    return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame()
+
+def _iter_feature_columns(source) -> Iterator[Tuple[List[Any], List[Any]]]:
+    """
+    Stream (names, descriptions) column lists from the input CSV, one block at a time.
+    With pyarrow, its multi-threaded streaming reader parses only the two input columns
+    as strings and hands them over as plain lists (no DataFrame per chunk); otherwise
+    pandas reads PRESCAN_CHUNK_ROWS rows at a time.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        # only the two input columns are parsed (as plain strings, no type inference)
+        for chunk in pd.read_csv(source, chunksize=PRESCAN_CHUNK_ROWS,
+                                 usecols=lambda c: c in REQUIRED_COLS, dtype=str):
+            _check_required(chunk.columns)
+            yield chunk["feature_name"].tolist(), chunk["feature_description"].tolist()
+        return
+
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=PRESCAN_BLOCK_BYTES),
+        # quoted descriptions may span lines; without this, blocks split mid-cell
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.string() for c in REQUIRED_COLS},
+            include_columns=REQUIRED_COLS,
+            include_missing_columns=True,
+        ),
+    )
+    # include_missing_columns keeps the reader open so a missing column can still raise the
+    # usual "Missing required columns" error: with strings_can_be_null left False a present
+    # column never yields None (empty cells are ""), so an all-None column is a missing one
+    header = reader.schema.names
+    for batch in reader:
+        names = batch.column(header.index("feature_name")).to_pylist()
+        descs = batch.column(header.index("feature_description")).to_pylist()
+        missing = [c for c, col in zip(REQUIRED_COLS, (names, descs)) if col and all(v is None for v in col)]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        yield names, descs
+
+def process_dataframe_with_prescan(
+    df: pd.DataFrame,
+    terminology_json: str | Path,
+    out_csv: Optional[str | Path] = None,
+    split_by_domain_dir: Optional[str | Path] = None,
+) -> pd.DataFrame:
+    """Same as process_csv_with_prescan, for a DataFrame that is already in memory."""
+    results = _prescan_frame(df, load_terminology_json(terminology_json))
+    _write_outputs(results, out_csv, split_by_domain_dir, set())
+    return results
+
+def _check_required(columns) -> None:
+    missing = [c for c in REQUIRED_COLS if c not in columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
 
-    terminology = load_terminology_json(terminology_json)
+def _prescan_frame(df: pd.DataFrame, terminology: Dict[str, str]) -> pd.DataFrame:
+    _check_required(df.columns)
+    return _prescan_rows(df["feature_name"].tolist(), df["feature_description"].tolist(), terminology)
 
+def _prescan_rows(names: List[Any], descs: List[Any], terminology: Dict[str, str]) -> pd.DataFrame:
     # 2) Expand + Prescan
     rows: List[Dict[str, Any]] = []
-    for i, row in df.iterrows():
-        name = str(row["feature_name"]) if pd.notna(row["feature_name"]) else ""
-        desc = str(row["feature_description"]) if pd.notna(row["feature_description"]) else ""
+    for name, desc in zip(names, descs):
+        # blank cells arrive as None (pyarrow) or NaN (pandas)
+        name = "" if name is None or name != name else str(name)
+        desc = "" if desc is None or desc != desc else str(desc)
 
         merged_expanded, exp_name, exp_desc = expand_fields(name, desc, terminology)
 
@@ -78,18 +157,27 @@ def process_csv_with_prescan(
             "prescan_keyword_hits": ps.keyword_hits,               # dict: domain -> [snippets]
         })
 
-    results = pd.DataFrame(rows)
+    return pd.DataFrame(rows)
 
+def _append_csv(df: pd.DataFrame, path: Path, written: set) -> None:
+    """Overwrite `path` on its first write of this run, append (no header) afterwards."""
+    first = path not in written
+    df.to_csv(path, mode="w" if first else "a", header=first, index=False)
+    written.add(path)
+
+def _write_outputs(results: pd.DataFrame,
+                   out_csv: Optional[str | Path],
+                   split_by_domain_dir: Optional[str | Path],
+                   written: set) -> None:
     # 3) Optional: write consolidated CSV
     if out_csv:
         out_csv = Path(out_csv)
         out_csv.parent.mkdir(parents=True, exist_ok=True)
         # Convert lists/dicts to JSON strings for safe CSV storage
-        json_cols = ["prescan_domains", "prescan_primary_regions", "prescan_law_hits", "prescan_keyword_hits"]
         to_write = results.copy()
-        for c in json_cols:
-            to_write[c] = to_write[c].apply(lambda v: json.dumps(v, ensure_ascii=False))
-        to_write.to_csv(out_csv, index=False)
+        for c in JSON_COLS:
+            to_write[c] = [dumps_json(v) for v in to_write[c]]
+        _append_csv(to_write, out_csv, written)
 
     # 4) Optional: split by domain and write one CSV per category
     if split_by_domain_dir:
@@ -102,14 +190,12 @@ def process_csv_with_prescan(
         # Separate items with no domain (NaN after explode)
         no_domain_df = exploded[exploded["domain"].isna()].copy()
         if not no_domain_df.empty:
-            no_domain_df.to_csv(split_dir / "domain__NONE.csv", index=False)
+            _append_csv(no_domain_df, split_dir / "domain__NONE.csv", written)
 
         # Write one CSV per domain
         for domain, group in exploded.dropna(subset=["domain"]).groupby("domain"):
             safe = "".join(ch if ch.isalnum() or ch in (" ", "_", "-") else "_" for ch in domain).strip().replace(" ", "_")
-            group.to_csv(split_dir / f"domain__{safe}.csv", index=False)
-
-    return results
+            _append_csv(group, split_dir / f"domain__{safe}.csv", written)
 
 if __name__ == "__main__":
     # Example CLI usage:
@@ -121,7 +207,7 @@ if __name__ == "__main__":
     import argparse
 
     p = argparse.ArgumentParser()
-    p.add_argument("--input", required=True, help="Path to input CSV with 'feature_name','feature_description'")
+    p.add_argument("--input", required=True, help="Path to input CSV with 'feature_name','feature_description' ('-' for stdin)")
     p.add_argument("--terms", required=True, help="Path to terminology JSON")
     p.add_argument("--out", default=None, help="Optional consolidated CSV output path")
     p.add_argument("--split", default=None, help="Optional folder to write per-domain CSVs")
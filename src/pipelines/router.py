@@ -197,7 +197,7 @@ def route_row(row: pd.Series, *, cfg: RouterConfig = RouterConfig()) -> Dict[str
 
 def route_dataframe(df: pd.DataFrame, *, cfg: RouterConfig = RouterConfig()) -> pd.DataFrame:
     routes, reasons = [], []
-    for _, row in df.iterrows():
+    for row in df.to_dict("records"):
         out = route_row(row, cfg=cfg)
         routes.append(out["agents"])
         reasons.append(out["reason"])
@@ -208,7 +208,9 @@ def route_dataframe(df: pd.DataFrame, *, cfg: RouterConfig = RouterConfig()) ->
 
 def build_agent_queues(df: pd.DataFrame, agents_col: str = "route_agents") -> Dict[str, List[int]]:
     queues: Dict[str, List[int]] = {}
-    for idx, row in df.iterrows():
-        for agent in _to_list(row.get(agents_col, [])):
+    if agents_col not in df.columns:
+        return queues
+    for idx, agents in zip(df.index, df[agents_col].tolist()):
+        for agent in _to_list(agents):
             queues.setdefault(agent, []).append(int(idx))
     return queues
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import json
 from pathlib import Path
 import argparse
 import pandas as pd
@@ -9,10 +8,48 @@ from src.pipelines.router import (
     route_dataframe,
     build_agent_queues,
 )
+from src.utils.helpers import read_csv_fast
+from src.utils.json_parser import write_json_file
 
 def _comma_split(s: str) -> list[str]:
     return [x.strip() for x in s.split(",") if x.strip()]
 
+def route_csv(in_csv: str | Path,
+              out_csv: str | Path,
+              *,
+              cfg: RouterConfig = RouterConfig(),
+              queues_json: str | Path | None = None,
+              split_dir: str | Path | None = None) -> pd.DataFrame:
+    """Route an enriched CSV and write the routed CSV (+ optional queues JSON / per-agent CSVs)."""
+    in_csv = Path(in_csv)
+    out_csv = Path(out_csv)
+
+    df = read_csv_fast(in_csv)
+    df_routed = route_dataframe(df, cfg=cfg)
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    df_routed.to_csv(out_csv, index=False)
+    print(f"Wrote routed CSV → {out_csv}")
+
+    queues = build_agent_queues(df_routed)
+
+    if queues_json:
+        qpath = Path(queues_json)
+        qpath.parent.mkdir(parents=True, exist_ok=True)
+        write_json_file(queues, qpath)
+        print(f"Wrote agent queues JSON → {qpath}")
+
+    if split_dir:
+        split_dir = Path(split_dir)
+        split_dir.mkdir(parents=True, exist_ok=True)
+        for agent, idxs in queues.items():
+            safe = "".join(ch if ch.isalnum() or ch in (" ", "_", "-") else "_" for ch in agent).strip().replace(" ", "_")
+            df_agent = df_routed.loc[idxs].copy()
+            df_agent.to_csv(split_dir / f"{safe}.csv", index=False)
+        print(f"Wrote per-agent CSVs → {split_dir}")
+
+    return df_routed
+
 def main():
     p = argparse.ArgumentParser(
         description="Route enriched compliance rows to domain agents (no LLM calls)."
@@ -39,11 +76,6 @@ def main():
 
     args = p.parse_args()
 
-    in_csv = Path(args.in_csv)
-    out_csv = Path(args.out_csv)
-
-    df = pd.read_csv(in_csv)
-
     # Default to category-only unless --legacy is set
     category_only = True if not args.use_legacy else False
     if args.category_only:
@@ -56,30 +88,8 @@ def main():
         max_agents_per_item=args.max_agents,
         require_review_labels=tuple(_comma_split(args.require_review_labels)),
     )
-
-    df_routed = route_dataframe(df, cfg=cfg)
-
-    out_csv.parent.mkdir(parents=True, exist_ok=True)
-    df_routed.to_csv(out_csv, index=False)
-    print(f"Wrote routed CSV → {out_csv}")
-
-    queues = build_agent_queues(df_routed)
-
-    if args.queues_json:
-        qpath = Path(args.queues_json)
-        qpath.parent.mkdir(parents=True, exist_ok=True)
-        with open(qpath, "w", encoding="utf-8") as f:
-            json.dump(queues, f, ensure_ascii=False, indent=2)
-        print(f"Wrote agent queues JSON → {qpath}")
-
-    if args.split_dir:
-        split_dir = Path(args.split_dir)
-        split_dir.mkdir(parents=True, exist_ok=True)
-        for agent, idxs in queues.items():
-            safe = "".join(ch if ch.isalnum() or ch in (" ", "_", "-") else "_" for ch in agent).strip().replace(" ", "_")
-            df_agent = df_routed.loc[idxs].copy()
-            df_agent.to_csv(split_dir / f"{safe}.csv", index=False)
-        print(f"Wrote per-agent CSVs → {split_dir}")
+    route_csv(args.in_csv, args.out_csv, cfg=cfg,
+              queues_json=args.queues_json, split_dir=args.split_dir)
 
 if __name__ == "__main__":
     main()
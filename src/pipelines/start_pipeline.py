@@ -1,7 +1,8 @@
 # src/pipelines/run_all.py
 from __future__ import annotations
-import argparse, os, sys, subprocess, time, shlex, textwrap
+import argparse, io, os, sys, subprocess, time, shlex, textwrap
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import platform
 
 def q(s: str) -> str:
@@ -26,6 +27,9 @@ except Exception:
     RICH = False
     console = None
 
+# stages run under the same interpreter/venv as this runner (no PATH lookup for "python")
+PY = q(sys.executable)
+
 def run(cmd: str, log_path: Path) -> int:
     env = os.environ.copy()
     env["PYTHONUTF8"] = "1"   # make child Python use UTF-8 for stdio
@@ -47,11 +51,96 @@ def run(cmd: str, log_path: Path) -> int:
         rc = proc.wait()
     return rc
 
+def pipeline_paths(outdir: str | Path) -> Dict[str, Path]:
+    out = Path(outdir)
+    return {
+        "prescan_csv": out / "prescan_results.csv",
+        "by_domain_dir": out / "by_domain",
+        "domain_none": out / "by_domain" / "domain__NONE.csv",
+        "enriched_csv": out / "llm_enriched.csv",
+        "routed_csv": out / "llm_routed.csv",
+        "queues_json": out / "agent_queues.json",
+        "queues_dir": out / "queues",
+        "agent_results": out / "agent_results.csv",
+        "final_csv": out / "final_results.csv",
+        "final_parquet": out / "final_results.parquet",
+        "logs_dir": out / "logs",
+    }
+
+def run_pipeline(input_csv,
+                 terms: str | Path = "data/terminology.json",
+                 outdir: str | Path = "outputs",
+                 *,
+                 only_llm: bool = False,
+                 llm_all: bool = False,
+                 llm_for_llm_categorized: bool = False,
+                 workers: int = 8,
+                 llm_min_interval: float = 1.0,
+                 llm_jitter: float = 0.0,
+                 batch_size: Optional[int] = None,
+                 progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None) -> Path:
+    """
+    Run every stage in this process (no interpreter spawn per stage).
+    `input_csv` may be a path, CSV bytes, a binary file object or an in-memory DataFrame;
+    all but the DataFrame go through the streaming prescan.
+    `progress_cb` receives structured events:
+        {"stage": "Agents", "index": 4, "total": 5, "status": "start"|"done", "pct": 0.8}
+    Returns the final results CSV path; stage errors propagate to the caller.
+    """
+    # stage modules pull in pandas / Gemini SDK; import them only when running in-process
+    import pandas as pd
+    from src.pipelines.prescan_pipeline import process_csv_with_prescan, process_dataframe_with_prescan
+    from src.pipelines.llm_enrichment_none import enrich_none_only
+    from src.pipelines.router import RouterConfig
+    from src.pipelines.router_cli import route_csv
+    from src.pipelines import agent_runner
+    from src.pipelines.finalize_results import finalize
+
+    paths = pipeline_paths(outdir)
+    Path(outdir).mkdir(parents=True, exist_ok=True)
+
+    def _prescan():
+        source = io.BytesIO(input_csv) if isinstance(input_csv, (bytes, bytearray)) else input_csv
+        if isinstance(source, pd.DataFrame):
+            process_dataframe_with_prescan(input_csv, terms, paths["prescan_csv"], paths["by_domain_dir"])
+        else:
+            process_csv_with_prescan(source, terms, paths["prescan_csv"], paths["by_domain_dir"],
+                                     keep_results=False)
+
+    stages: List[Tuple[str, Callable[[], Any]]] = [
+        ("Prescan", _prescan),
+        ("LLM Enrichment (NONE)", lambda: enrich_none_only(
+            paths["prescan_csv"], paths["domain_none"], paths["enriched_csv"], batch_size=batch_size,
+            workers=workers, min_interval=llm_min_interval)),
+        ("Router", lambda: route_csv(
+            paths["enriched_csv"], paths["routed_csv"], cfg=RouterConfig(only_llm=only_llm),
+            queues_json=paths["queues_json"], split_dir=paths["queues_dir"])),
+        ("Agents", lambda: agent_runner.main(
+            paths["routed_csv"], paths["agent_results"],
+            enable_llm_for_llm_categorized=llm_for_llm_categorized and not llm_all,
+            enable_llm_for_all=llm_all,
+            max_workers=workers,
+            min_llm_interval_sec=llm_min_interval,
+            llm_jitter_sec=llm_jitter)),
+        ("Finalize", lambda: finalize(
+            paths["enriched_csv"], paths["agent_results"], paths["final_csv"])),
+    ]
+
+    total = len(stages)
+    for i, (label, fn) in enumerate(stages, 1):
+        if progress_cb:
+            progress_cb({"stage": label, "index": i, "total": total, "status": "start", "pct": (i - 1) / total})
+        fn()
+        if progress_cb:
+            progress_cb({"stage": label, "index": i, "total": total, "status": "done", "pct": i / total})
+    return paths["final_csv"]
+
 def main():
     p = argparse.ArgumentParser(
         description="End-to-end compliance pipeline runner (prescan → enrich → route → agents → finalize)."
     )
-    p.add_argument("--input", default="data/sample_features.csv")
+    p.add_argument("--input", default="data/sample_features.csv",
+                   help="Input CSV path, or '-' to read it from stdin (forwarded to the prescan stage)")
     p.add_argument("--terms", default="data/terminology.json")
     p.add_argument("--outdir", default="outputs")
     # Routing/agent knobs (match your existing CLIs)
@@ -59,9 +148,11 @@ def main():
     p.add_argument("--llm-all", action="store_true", help="Agent runner: send every row to the LLM")
     p.add_argument("--llm-for-llm-categorized", action="store_true",
                    help="Agent runner: LLM only for rows with llm_domains")
-    p.add_argument("--workers", type=int, default=8, help="Agent runner: parallel workers")
+    p.add_argument("--workers", type=int, default=8, help="Enrichment/agent runner: parallel workers")
     p.add_argument("--llm-min-interval", type=float, default=1.0, help="Min seconds between LLM calls")
     p.add_argument("--llm-jitter", type=float, default=0.0, help="Extra random delay per LLM call")
+    p.add_argument("--batch-size", type=int, default=None,
+                   help="Enrichment: features per LLM call (default: all in one call)")
     p.add_argument("--skip-prescan", action="store_true")
     p.add_argument("--skip-enrich", action="store_true")
     p.add_argument("--skip-route", action="store_true")
@@ -69,19 +160,7 @@ def main():
     p.add_argument("--skip-final", action="store_true")
     args = p.parse_args()
 
-    out = Path(args.outdir)
-    paths = {
-        "prescan_csv": out / "prescan_results.csv",
-        "by_domain_dir": out / "by_domain",
-        "domain_none": out / "by_domain" / "domain__NONE.csv",
-        "enriched_csv": out / "llm_enriched.csv",
-        "routed_csv": out / "llm_routed.csv",
-        "queues_json": out / "agent_queues.json",
-        "queues_dir": out / "queues",
-        "agent_results": out / "agent_results.csv",
-        "final_csv": out / "final_results.csv",
-        "logs_dir": out / "logs",
-    }
+    paths = pipeline_paths(args.outdir)
 
     # Build commands (string form for nice logging)
     cmds = []
@@ -89,7 +168,7 @@ def main():
     if not args.skip_prescan:
         cmds.append((
             "Prescan",
-            f"python -m src.pipelines.prescan_pipeline "
+            f"{PY} -m src.pipelines.prescan_pipeline "
             f"--input {q(args.input)} "
             f"--terms {q(args.terms)} "
             f"--out {q(paths['prescan_csv'])} "
@@ -99,17 +178,20 @@ def main():
     if not args.skip_enrich:
         cmds.append((
             "LLM Enrichment (NONE)",
-            f"python -m src.pipelines.llm_enrichment_none "
+            f"{PY} -m src.pipelines.llm_enrichment_none "
             f"--prescan {q(paths['prescan_csv'])} "
             f"--none {q(paths['domain_none'])} "
-            f"--out {q(paths['enriched_csv'])}"
+            f"--out {q(paths['enriched_csv'])} "
+            f"--workers {args.workers} "
+            f"--llm-min-interval {args.llm_min_interval}"
+            + (f" --batch-size {args.batch_size}" if args.batch_size else "")
         ))
 
     if not args.skip_route:
         only_llm_flag = " --only-llm" if args.only_llm else ""
         cmds.append((
             "Router",
-            f"python -m src.pipelines.router_cli "
+            f"{PY} -m src.pipelines.router_cli "
             f"--in {q(paths['enriched_csv'])} "
             f"--out {q(paths['routed_csv'])} "
             f"--queues-out {q(paths['queues_json'])} "
@@ -122,19 +204,19 @@ def main():
         llm_flag = " --llm-all" if args.llm_all else (" --llm-for-llm-categorized" if args.llm_for_llm_categorized else "")
         cmds.append((
             "Agents",
-            f"python -m src.pipelines.agent_runner "
+            f"{PY} -m src.pipelines.agent_runner "
             f"--in {q(paths['routed_csv'])} "
             f"--out {q(paths['agent_results'])}"
             f"{llm_flag} "
-            # f"--workers {args.workers} "
-            # f"--llm-min-interval {args.llm_min_interval} "
-            # f"--llm-jitter {args.llm_jitter}"
+            f"--workers {args.workers} "
+            f"--llm-min-interval {args.llm_min_interval} "
+            f"--llm-jitter {args.llm_jitter}"
         ))
 
     if not args.skip_final:
         cmds.append((
             "Finalize",
-            f"python -m src.pipelines.finalize_results "
+            f"{PY} -m src.pipelines.finalize_results "
             f"--in-enriched {q(paths['enriched_csv'])} "
             f"--in-agents {q(paths['agent_results'])} "
             f"--out {q(paths['final_csv'])}"
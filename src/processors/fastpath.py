@@ -0,0 +1,90 @@
+"""
+Rule-based fast path for the Gemini classifier.
+Features that name a specific regulation in a requirement context (or explicitly say
+there is no regional variation) are answered locally; everything else still goes to the LLM.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only hits at or above this confidence short-circuit the LLM
+FASTPATH_MIN_CONFIDENCE = 0.9
+
+# (keyword, classification, confidence, regulation label)
+# All-caps keywords (acronyms, bill numbers) match case-sensitively, so e.g. a "dsa" key
+# type is not read as the Digital Services Act; phrases match case-insensitively.
+FASTPATH_RULES: List[Tuple[str, str, float, Optional[str]]] = [
+    ("GDPR", "REQUIRED", 0.95, "GDPR"),
+    ("Digital Services Act", "REQUIRED", 0.95, "EU Digital Services Act"),
+    ("DSA", "REQUIRED", 0.95, "EU Digital Services Act"),
+    ("COPPA", "REQUIRED", 0.95, "COPPA"),
+    ("CCPA", "REQUIRED", 0.95, "CCPA"),
+    ("SB976", "REQUIRED", 0.95, "California SB976"),
+    ("SB 976", "REQUIRED", 0.95, "California SB976"),
+    ("Utah Social Media Regulation Act", "REQUIRED", 0.95, "Utah Social Media Regulation Act"),
+    ("Florida Online Protections for Minors", "REQUIRED", 0.95, "Florida Online Protections for Minors"),
+    ("NCMEC", "REQUIRED", 0.95, "US 18 U.S.C. 2258A (NCMEC reporting)"),
+    ("2258A", "REQUIRED", 0.95, "US 18 U.S.C. 2258A (NCMEC reporting)"),
+    ("no regional variation", "NOT REQUIRED", 0.92, None),
+    ("no geo-specific", "NOT REQUIRED", 0.92, None),
+]
+
+_RULES_BY_KEYWORD = {kw.lower(): (label, conf, kw, reg) for kw, label, conf, reg in FASTPATH_RULES}
+
+def _alternation(keywords: List[str], flags: int = 0) -> re.Pattern:
+    # longest keywords first, so a single scan finds every hit
+    return re.compile(
+        r"\b(?:" + "|".join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True)) + r")\b", flags)
+
+_ACRONYMS = [kw for kw, _, _, _ in FASTPATH_RULES if kw == kw.upper()]
+_ACRONYM_RE = _alternation(_ACRONYMS)
+_PHRASE_RE = _alternation([kw for kw, _, _, _ in FASTPATH_RULES if kw != kw.upper()], re.IGNORECASE)
+
+# A regulation only decides the feature when its clause says the feature must follow it
+# ("to comply with GDPR", "required by COPPA") and nothing in that clause negates it
+# ("already complies with GDPR", "unrelated to the DSA").
+_CLAUSE_SPLIT_RE = re.compile(r"[.;!?\n]")
+_REQUIREMENT_RE = re.compile(
+    r"\b(?:compl(?:y|ies|iance)\s+with|in\s+accordance\s+with|(?:required|mandated)\s+by|"
+    r"pursuant\s+to|to\s+(?:meet|satisfy|implement)|obligations?\s+under|under)\b",
+    re.IGNORECASE,
+)
+_NEGATION_RE = re.compile(r"\b(?:already|unrelated|not|no|without|never|none)\b|n't\b", re.IGNORECASE)
+
+def _clause(text: str, start: int, end: int) -> Tuple[str, str]:
+    """(text of the clause before the match, rest of the clause after it)."""
+    before = _CLAUSE_SPLIT_RE.split(text[:start])[-1]
+    after = _CLAUSE_SPLIT_RE.split(text[end:])[0]
+    return before, after
+
+def _is_requirement(text: str, m: re.Match) -> bool:
+    before, after = _clause(text, m.start(), m.end())
+    return bool(_REQUIREMENT_RE.search(before)) and not _NEGATION_RE.search(before + " " + after)
+
+def fastpath_classify(feature_name: str, feature_description: str) -> Optional[Dict[str, Any]]:
+    """
+    Return a classifier-shaped result dict when the rules decide the feature, else None.
+    Conflicting labels (e.g. a law name plus "no regional variation") always fall through,
+    as does a regulation mentioned outside a requirement context.
+    """
+    text = f"{feature_name}. {feature_description}"
+    matches = [*_ACRONYM_RE.finditer(text), *_PHRASE_RE.finditer(text)]
+    hits = [(_RULES_BY_KEYWORD[m.group(0).lower()], m) for m in matches]
+    if not hits or len({rule[0] for rule, _ in hits}) > 1:
+        return None
+    hits = [(rule, m) for rule, m in hits if rule[0] != "REQUIRED" or _is_requirement(text, m)]
+    if not hits:
+        return None
+    label, conf, _, _ = max((rule for rule, _ in hits), key=lambda h: h[1])
+    if conf < FASTPATH_MIN_CONFIDENCE:
+        return None
+    keywords = sorted({rule[2] for rule, _ in hits})
+    regulations = sorted({rule[3] for rule, _ in hits if rule[3]})
+    return {
+        "classification": label,
+        "reasoning": f"Rule-based fast path matched: {', '.join(keywords)}",
+        "confidence": conf,
+        "related_regulations": regulations,
+        "input_feature_name": feature_name,
+        "source": "fastpath",
+    }
@@ -4,19 +4,42 @@ Gemini classifier for geo-compliance detection.
 
 import os
 import json
-from typing import Dict, Any, Optional
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Optional
 from dotenv import load_dotenv
 import google.generativeai as genai
 from google.generativeai.generative_models import GenerativeModel
 from google.generativeai.client import configure
-from .prompt_templates import build_classification_prompt
+from .prompt_templates import build_batch_prompt, build_classification_prompt
 from .text_preprocessor import expand_terminology
 from src.utils.get_context import get_context
+from src.cache.llm_cache import MISSING_RESULT_REASON, cached, feature_request, get_cache, is_cacheable, relabel
+from .fastpath import fastpath_classify
+from src.utils.rate_limit import (
+    AIMDConcurrency, RateLimiter, full_jitter_backoff, is_rate_limit_error, is_server_error,
+    is_transient_error, retry_after_seconds,
+)
+
+# features per batch prompt, sized to the model's context/output budget
+BATCH_SIZE_BY_MODEL = {"gemini-2.5-flash": 10}
+DEFAULT_BATCH_SIZE = 5
 
 class GeminiClassifier:
     #constructor to load api key from .env
-    def __init__(self) -> None:
+    def __init__(self, max_concurrency: int = 10, rpm: float = 60, tpm: Optional[float] = 1_000_000,
+                 timeout: float = 30.0, max_retries: int = 3) -> None:
         load_dotenv()
+        # per-request deadline and retry budget, so one hung call can't hold a worker slot
+        self.timeout = float(timeout)
+        self.max_retries = max(0, int(max_retries))
+        # upper bound on Gemini calls in flight from classify_features_batch
+        self.max_concurrency = max(1, int(max_concurrency))
+        # proactive RPM/TPM budget shared by every call this classifier makes
+        self.rate_limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        # calls actually in flight adapt between 2 and max_concurrency from latency / 429 feedback
+        self.concurrency = AIMDConcurrency(c_min=min(2, self.max_concurrency), c_max=self.max_concurrency)
         
     
 
@@ -31,12 +54,48 @@ class GeminiClassifier:
             configure(api_key=my_api_key)
             
             # Store the model for later use
-            self.model = GenerativeModel("gemini-2.5-flash")
+            self.model_name = "gemini-2.5-flash"
+            self.model = GenerativeModel(self.model_name)
         except Exception as e:
             raise ValueError(f"Failed to configure Gemini API: {str(e)}. Check your API key and library version.")
 
-    #expand terminology, build prompt, send to gemini, parse response from gemini to dict
+    #rate-limited, deadline-bounded generate_content; 429s and timeouts retry with exponential backoff
+    def _generate(self, prompt: str):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(estimated_tokens=len(prompt) // 4)
+            self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                response = self.model.generate_content(prompt, request_options={"timeout": self.timeout})
+                self.concurrency.release(time.monotonic() - started)
+                return response
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                # 429s and 5xx both mean "back off": shrink the shared concurrency limit
+                self.concurrency.release(time.monotonic() - started,
+                                         throttled=rate_limited or is_server_error(e))
+                if not (rate_limited or is_transient_error(e)) or attempt == self.max_retries:
+                    raise
+                wait = full_jitter_backoff(attempt, cap=30)
+                if rate_limited:
+                    self.rate_limiter.penalize()
+                    # honour the server's hint when it gives one (plus jitter so workers don't retry in lockstep)
+                    hinted = retry_after_seconds(e)
+                    if hinted is not None:
+                        wait = hinted + random.uniform(0, 1)
+                time.sleep(wait)
+
+    #rule-decidable features are answered locally; everything else goes to gemini
     def classify_feature(self, feature_name:str, feature_description:str) -> Dict[str, Any]:
+        fast = fastpath_classify(feature_name, feature_description)
+        if fast is not None:
+            return fast
+        return self._classify_with_llm(feature_name, feature_description)
+
+    #expand terminology, build prompt, send to gemini, parse response from gemini to dict
+    #repeated / near-identical features are answered from the LLM cache
+    @cached
+    def _classify_with_llm(self, feature_name:str, feature_description:str) -> Dict[str, Any]:
         try:
             expanded_name = expand_terminology(feature_name)
             expanded_desc = expand_terminology(feature_description)
@@ -56,7 +115,7 @@ Context:
 
             prompt = build_classification_prompt (expanded_name, expanded_desc,self.context)
 
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
 
             # Parse the JSON response
             parsed_result = self._parse_json_response(response.text)
@@ -70,17 +129,92 @@ Context:
         except Exception as e:
             return {'Error!': str(e)}
     
-    def classify_features_batch(self, features_batch: list, batch_size: int = 5) -> list:
+    def classify_features_batch(self, features_batch: list, batch_size: Optional[int] = None,
+                                on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> list:
         """
-        Classify multiple features in a single API call for efficiency.
+        Classify multiple features, `batch_size` per API call, with up to
+        `self.max_concurrency` calls in flight at once.
         
         Args:
             features_batch: List of dicts with 'feature_name' and 'feature_description'
             batch_size: Number of features to process in one API call
+                        (None = BATCH_SIZE_BY_MODEL default for this model)
+            on_result: Optional callback(index, result), called on the calling thread as each
+                       result becomes available (fast path/cache hits first, then per API call)
         
         Returns:
-            List of classification results
+            List of classification results (same order as features_batch)
         """
+        # identical (name, description) pairs, ignoring case and surrounding whitespace,
+        # are classified once and fanned back out; each copy keeps its own row's name
+        keys = [(f['feature_name'].strip().lower(), f['feature_description'].strip().lower())
+                for f in features_batch]
+        first_by_key: Dict[tuple, dict] = {}
+        for k, f in zip(keys, features_batch):
+            first_by_key.setdefault(k, f)
+        if len(first_by_key) < len(keys):
+            def _row_result(i: int, result: Dict[str, Any]) -> Dict[str, Any]:
+                result = dict(result)
+                if 'input_feature_name' in result:
+                    result['input_feature_name'] = features_batch[i]['feature_name']
+                return result
+
+            unique_keys = list(first_by_key)
+            rows_by_key: Dict[tuple, list] = {}
+            for i, k in enumerate(keys):
+                rows_by_key.setdefault(k, []).append(i)
+
+            def _fan_out(u: int, result: Dict[str, Any]) -> None:
+                for i in rows_by_key[unique_keys[u]]:
+                    on_result(i, _row_result(i, result))
+
+            unique_results = self.classify_features_batch(
+                list(first_by_key.values()), batch_size, on_result=_fan_out if on_result else None)
+            by_key = dict(zip(unique_keys, unique_results))
+            return [_row_result(i, by_key[k]) for i, k in enumerate(keys)]
+
+        # rule-decidable features never reach the batch prompt
+        fast_results = [fastpath_classify(f['feature_name'], f['feature_description']) for f in features_batch]
+        # one batched cache lookup (same keys as classify_feature) before building prompts
+        cache = get_cache()
+        lookup = [i for i, fast in enumerate(fast_results) if fast is None]
+        if lookup:
+            requests = [feature_request(self.model_name, features_batch[i]['feature_name'],
+                                        features_batch[i]['feature_description']) for i in lookup]
+            hits = cache.get_many([p for p, _ in requests], [t for _, t in requests], scope=self.model_name)
+            for i, hit in zip(lookup, hits):
+                if hit is not None:
+                    hit = relabel(hit, features_batch[i]['feature_name'], features_batch[i]['feature_description'])
+                fast_results[i] = hit
+        if on_result:
+            for i, fast in enumerate(fast_results):
+                if fast is not None:
+                    on_result(i, fast)
+        # fast_results doubles as the preallocated output: LLM answers land in their slots
+        pending = [i for i, fast in enumerate(fast_results) if fast is None]
+        if not pending:
+            return fast_results
+        step = max(1, batch_size or BATCH_SIZE_BY_MODEL.get(self.model_name, DEFAULT_BATCH_SIZE))
+        chunk_idx = [pending[i:i + step] for i in range(0, len(pending), step)]
+        chunks = [[features_batch[i] for i in idxs] for idxs in chunk_idx]
+        # calls are network-bound, so threads overlap the round trips; chunks are
+        # collected as they finish so on_result sees the first answers early
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as ex:
+            futures = {ex.submit(self._classify_batch_with_llm, chunk): idxs
+                       for chunk, idxs in zip(chunks, chunk_idx)}
+            for fut in as_completed(futures):
+                for i, result in zip(futures[fut], fut.result()):
+                    fast_results[i] = result
+                    if on_result:
+                        on_result(i, result)
+        to_store = [(feature_request(self.model_name, features_batch[i]['feature_name'],
+                                     features_batch[i]['feature_description']), fast_results[i])
+                    for i in pending if is_cacheable(fast_results[i])]
+        cache.set_many([p for (p, _), _ in to_store], [r for _, r in to_store],
+                       [t for (_, t), _ in to_store], scope=self.model_name)
+        return fast_results
+
+    def _classify_batch_with_llm(self, features_batch: list) -> list:
         try:
             # Prepare the batch data with expanded terminology
             batch_data = []
@@ -99,7 +233,7 @@ Context:
             batch_prompt = self._build_batch_prompt(batch_data)
             
             # Make single API call
-            response = self.model.generate_content(batch_prompt)
+            response = self._generate(batch_prompt)
             
             # Parse batch response
             batch_results = self._parse_batch_response(response.text, batch_data)
@@ -112,42 +246,7 @@ Context:
     
     def _build_batch_prompt(self, batch_data: list) -> str:
         """Build a prompt for multiple features at once."""
-        prompt = """You are an expert in geo-regulation compliance for social media platforms. Analyze the following TikTok features and classify each one.
-
-For EACH feature, determine if it requires geo-specific compliance logic by checking if it implements region-specific laws like:
-- EU Digital Services Act (DSA)
-- California SB976 (social media age requirements)
-- Florida HB 3 (social media restrictions for minors)
-- Utah Social Media Regulation Act
-- US NCMEC reporting requirements for child safety content
-
-Respond with a JSON array where each object has this structure:
-{
-  "feature_index": <number>,
-  "classification": "REQUIRED" | "NOT REQUIRED" | "NEEDS HUMAN REVIEW",
-  "reasoning": "<detailed explanation>",
-  "confidence": <float 0.0-1.0>,
-  "related_regulations": [<list of applicable laws>]
-}
-
-IMPORTANT: Use 0-based indexing for feature_index (first feature = 0, second feature = 1, etc.)
-
-Features to analyze:
-
-"""
-        
-        for item in batch_data:
-            prompt += f"""
-Feature {item['index']}:
-Name: {item['expanded_name']}
-Description: {item['expanded_description']}
-
-"""
-        
-        prompt += """
-Return ONLY the JSON array with classifications for all features. No additional text."""
-        
-        return prompt
+        return build_batch_prompt(batch_data)
     
     def _parse_batch_response(self, response_text: str, batch_data: list) -> list:
         """Parse the batch JSON response."""
@@ -170,17 +269,13 @@ Return ONLY the JSON array with classifications for all features. No additional
             import json
             results_array = json.loads(json_text)
             
-            # Map results back to original features
+            # Map results back to original features (one dict lookup per feature, not a rescan)
+            result_by_index = {}
+            for result in results_array:
+                result_by_index.setdefault(result.get('feature_index'), result)
             final_results = []
             for item in batch_data:
-                feature_index = item['index']
-                
-                # Find the result for this feature
-                feature_result = None
-                for result in results_array:
-                    if result.get('feature_index') == feature_index:
-                        feature_result = result
-                        break
+                feature_result = result_by_index.get(item['index'])
                 
                 if feature_result:
                     final_results.append({
@@ -197,7 +292,7 @@ Return ONLY the JSON array with classifications for all features. No additional
                     # Fallback if result not found
                     final_results.append({
                         'classification': 'NEEDS HUMAN REVIEW',
-                        'reasoning': 'Result not found in batch response',
+                        'reasoning': MISSING_RESULT_REASON,
                         'confidence': 0.0,
                         'related_regulations': [],
                         'input_feature_name': item['feature_name'],
@@ -114,3 +114,49 @@ Provide your response in this exact JSON format:
 }"""
 
     return system_instructions + few_shot_examples + new_feature + output_format + context
+
+# Fixed parts of the batch prompt, assembled once at import; only the feature
+# blocks are formatted per call.
+BATCH_PROMPT_HEADER = """You are an expert in geo-regulation compliance for social media platforms. Analyze the following TikTok features and classify each one.
+
+For EACH feature, determine if it requires geo-specific compliance logic by checking if it implements region-specific laws like:
+- EU Digital Services Act (DSA)
+- California SB976 (social media age requirements)
+- Florida HB 3 (social media restrictions for minors)
+- Utah Social Media Regulation Act
+- US NCMEC reporting requirements for child safety content
+
+Respond with a JSON array where each object has this structure:
+{
+  "feature_index": <number>,
+  "classification": "REQUIRED" | "NOT REQUIRED" | "NEEDS HUMAN REVIEW",
+  "reasoning": "<detailed explanation>",
+  "confidence": <float 0.0-1.0>,
+  "related_regulations": [<list of applicable laws>]
+}
+
+IMPORTANT: Use 0-based indexing for feature_index (first feature = 0, second feature = 1, etc.)
+
+Features to analyze:
+
+"""
+
+BATCH_FEATURE_TEMPLATE = """
+Feature {index}:
+Name: {expanded_name}
+Description: {expanded_description}
+
+"""
+
+BATCH_PROMPT_FOOTER = """
+Return ONLY the JSON array with classifications for all features. No additional text."""
+
+def build_batch_prompt(batch_data: list) -> str:
+    """Prompt for several features at once; items carry index/expanded_name/expanded_description."""
+    return "".join([
+        BATCH_PROMPT_HEADER,
+        *(BATCH_FEATURE_TEMPLATE.format(index=item['index'], expanded_name=item['expanded_name'],
+                                        expanded_description=item['expanded_description'])
+          for item in batch_data),
+        BATCH_PROMPT_FOOTER,
+    ])
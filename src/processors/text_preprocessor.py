@@ -4,23 +4,36 @@ Converts abbreviations to full terms for better LLM understanding.
 Anson
 """
 
-import json
 import re #regular expression
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+from src.utils.json_parser import load_json_file
 
 def load_terminology() -> Dict[str, str]:
     terminology_path = Path(__file__).parent.parent.parent / "data" / "terminology.json"
+    # parsed once per file version instead of on every expand_terminology() call
+    return _load_terminology_file(str(terminology_path), terminology_path.stat().st_mtime)
 
-    with open(terminology_path, 'r') as f:
-        return json.load(f)
+@lru_cache(maxsize=4)
+def _load_terminology_file(path: str, mtime: float) -> Dict[str, str]:
+    return load_json_file(path)
     
 def expand_terminology(text: str, terminology: Optional[Dict[str,str]] = None) -> str:
     if terminology is None:
         terminology = load_terminology() 
+    # memoized per (text, terminology): repeated names/descriptions skip the regex pass
+    return _expand(text, tuple(terminology.items()))
 
+@lru_cache(maxsize=8)
+def _compile_terms(items: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[re.Pattern, str], ...]:
+    return tuple((re.compile(r'\b' + re.escape(abbrev) + r'\b'), full_term) for abbrev, full_term in items)
+
+@lru_cache(maxsize=1 << 17)
+def _expand(text: str, items: Tuple[Tuple[str, str], ...]) -> str:
     expanded_text = text
-    for abbrev, full_term in terminology.items():
-        expanded_text = re.sub(r'\b' + re.escape(abbrev) + r'\b', full_term, expanded_text)
+    # applied in order, so an expansion can itself contain a later abbreviation
+    for pattern, full_term in _compile_terms(items):
+        expanded_text = pattern.sub(full_term, expanded_text)
     
-    return expanded_text
\ No newline at end of file
+    return expanded_text
@@ -0,0 +1,68 @@
+from __future__ import annotations
+import queue
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+import pandas as pd
+
+T = TypeVar("T")
+
+def read_csv_fast(path: str | Path) -> pd.DataFrame:
+    """
+    Whole-file CSV read with pandas' multi-threaded pyarrow engine, falling back to the
+    default C engine when pyarrow isn't installed or can't parse the file. The pyarrow
+    engine splits the file into blocks without tracking quotes, so a file past one block
+    whose quoted cells contain newlines (descriptions, LLM reasoning) fails there.
+    Returns ordinary numpy-backed columns either way.
+    """
+    try:
+        return pd.read_csv(path, engine="pyarrow")
+    except (ImportError, ValueError):  # ParserError / ArrowInvalid are ValueErrors
+        return pd.read_csv(path)
+
+_PREFETCH_DONE = object()
+PREFETCH_POLL_SEC = 0.1
+
+def prefetch(iterable: Iterable[T], depth: int = 1) -> Iterator[T]:
+    """
+    Yield from `iterable` while a background thread produces up to `depth` items ahead,
+    so producing item N+1 (e.g. parsing the next CSV block, which pyarrow does outside
+    the GIL) overlaps with the caller's work on item N. Producer errors re-raise here.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        # bounded waits, so a consumer that went away never strands this thread on put()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=PREFETCH_POLL_SEC)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce() -> None:
+        it = iter(iterable)
+        try:
+            for item in it:
+                if not _put(item):
+                    return
+            _put(_PREFETCH_DONE)
+        except BaseException as e:  # handed to the consumer
+            _put(e)
+        finally:
+            # release the source (CSV reader, stdin) as soon as production ends
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=_produce, daemon=True).start()
+    try:
+        while (item := q.get()) is not _PREFETCH_DONE:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # consumer finished, raised or stopped early: let the producer exit
+        stop.set()
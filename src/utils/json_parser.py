@@ -1,5 +1,13 @@
 from __future__ import annotations
 import json
+from pathlib import Path
+from typing import Any
+
+# orjson is optional; it parses several times faster than the stdlib module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 def strict_json_array(text: str):
     s = (text or "").strip()
@@ -9,4 +17,32 @@ def strict_json_array(text: str):
         s = s[i:j].strip()
     elif "[" in s and "]" in s:
         s = s[s.find("["): s.rfind("]") + 1]
-    return json.loads(s)
\ No newline at end of file
+    return json.loads(s)
+
+def load_json_file(path: str | Path) -> Any:
+    """Read and parse a UTF-8 JSON file (orjson when installed, stdlib json otherwise)."""
+    raw = Path(path).read_bytes()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+def loads_json(text: str | bytes) -> Any:
+    """Parse JSON text (orjson when installed); malformed input raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def dumps_json(obj: Any) -> str:
+    """Compact UTF-8 JSON text (non-ASCII kept as-is); orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def write_json_file(obj: Any, path: str | Path) -> None:
+    """Write `obj` as indented UTF-8 JSON (orjson when installed, stdlib json otherwise)."""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
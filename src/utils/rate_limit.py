@@ -0,0 +1,197 @@
+"""
+Request pacing shared by the pipeline stages that call the LLM.
+"""
+
+from __future__ import annotations
+import random
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/sec, bursts of up to `capacity`.
+    Callers reserve a token under the lock and wait outside it, so concurrent
+    requests overlap their network time with each other's pacing delay.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` (possibly going negative = queued) and return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+class RateLimiter:
+    """
+    Requests-per-minute + tokens-per-minute budget. Both capacities refill continuously
+    from monotonic-clock deltas and a call proceeds once it fits in both
+    (the api_request_parallel_processor scheme).
+    """
+
+    def __init__(self, rpm: float, tpm: Optional[float] = None) -> None:
+        if rpm <= 0:
+            raise ValueError("rpm must be > 0")
+        self.rpm = float(rpm)
+        self.tpm = float(tpm) if tpm else None
+        self.available_request_capacity = self.rpm
+        self.available_token_capacity = self.tpm or 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._stamp
+        self._stamp = now
+        self.available_request_capacity = min(self.rpm, self.available_request_capacity + self.rpm * elapsed / 60.0)
+        if self.tpm:
+            self.available_token_capacity = min(self.tpm, self.available_token_capacity + self.tpm * elapsed / 60.0)
+
+    def _try_take(self, estimated_tokens: int) -> float:
+        """Take capacity if available and return 0, else return seconds until it should be."""
+        with self._lock:
+            self._refill()
+            tokens = min(float(estimated_tokens), self.tpm) if self.tpm else 0.0
+            need_req = 1.0 - self.available_request_capacity
+            need_tok = tokens - self.available_token_capacity if self.tpm else 0.0
+            if need_req <= 0 and need_tok <= 0:
+                self.available_request_capacity -= 1.0
+                if self.tpm:
+                    self.available_token_capacity -= tokens
+                return 0.0
+            wait_req = max(need_req, 0.0) * 60.0 / self.rpm
+            wait_tok = max(need_tok, 0.0) * 60.0 / self.tpm if self.tpm else 0.0
+            return max(wait_req, wait_tok, 0.001)
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        while True:
+            wait = self._try_take(estimated_tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self) -> None:
+        """Called on a 429: drain both buckets so every caller waits for a refill."""
+        with self._lock:
+            self._refill()
+            self.available_request_capacity = 0.0
+            self.available_token_capacity = 0.0
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status carried by an exception: api_core's `.code`, or `.response.status_code` (requests)."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return int(code)
+    code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for HTTP 429 / quota errors from the Gemini SDK (google.api_core ResourceExhausted)."""
+    return type(exc).__name__ in {"ResourceExhausted", "TooManyRequests"} or status_code(exc) == 429
+
+def is_transient_error(exc: BaseException) -> bool:
+    """True for timeouts / temporary server errors that are worth retrying."""
+    return isinstance(exc, TimeoutError) or type(exc).__name__ in {
+        "DeadlineExceeded", "ServiceUnavailable", "InternalServerError", "ReadTimeout", "ConnectTimeout",
+    }
+
+def is_server_error(exc: BaseException) -> bool:
+    """True for HTTP 5xx responses (server overloaded / failing), e.g. api_core ServiceUnavailable."""
+    code = status_code(exc)
+    if code is not None and 500 <= code < 600:
+        return True
+    return type(exc).__name__ in {"InternalServerError", "BadGateway", "ServiceUnavailable", "GatewayTimeout"}
+
+class AIMDConcurrency:
+    """
+    Concurrency gate whose limit adapts AIMD-style: after each call the limit grows by
+    `alpha` while the recent mean latency stays under target, is multiplied by `beta` when
+    it doesn't, and is cut (plus a `cooldown_sec` circuit breaker) on a 429 or 5xx. The latency
+    target is 1.5x the median of the first `window` samples unless given explicitly.
+    """
+
+    def __init__(self, c_min: int = 2, c_max: int = 10, alpha: float = 0.5, beta: float = 0.5,
+                 window: int = 20, target_latency: Optional[float] = None,
+                 cooldown_sec: float = 10.0) -> None:
+        self.c_min = max(1, int(c_min))
+        self.c_max = max(self.c_min, int(c_max))
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.cooldown_sec = float(cooldown_sec)
+        self.target_latency = target_latency
+        self.limit = float(self.c_min)
+        self._latencies: deque = deque(maxlen=window)
+        self._in_flight = 0
+        self._open_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                pause = self._open_until - time.monotonic()
+                if pause <= 0 and self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                self._cond.wait(timeout=pause if pause > 0 else None)
+
+    def release(self, latency: float, throttled: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.c_min, self.limit * self.beta)
+                self._open_until = time.monotonic() + self.cooldown_sec
+            else:
+                self._latencies.append(latency)
+                if self.target_latency is None and len(self._latencies) == self._latencies.maxlen:
+                    self.target_latency = 1.5 * statistics.median(self._latencies)
+                if self.target_latency is None or statistics.fmean(self._latencies) <= self.target_latency:
+                    self.limit = min(self.c_max, self.limit + self.alpha)
+                else:
+                    self.limit = max(self.c_min, self.limit * self.beta)
+            self._cond.notify_all()
+
+_RETRY_IN_RE = re.compile(r"retry in ([0-9]+(?:\.[0-9]+)?)\s*s", re.IGNORECASE)
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """
+    Server-suggested wait for a throttled call, if the error carries one:
+    an HTTP Retry-After header, a google.rpc RetryInfo detail, or the
+    "Please retry in 12.3s" hint in the Gemini error text.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    for detail in getattr(exc, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+    m = _RETRY_IN_RE.search(str(exc))
+    return float(m.group(1)) if m else None
+
+def full_jitter_backoff(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """AWS "full jitter": uniform(0, min(cap, base * 2**attempt)); spreads concurrent retries apart."""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
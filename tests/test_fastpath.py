@@ -0,0 +1,42 @@
+from src.processors.fastpath import fastpath_classify
+
+
+def test_regulation_in_requirement_context_is_required():
+    result = fastpath_classify("Teen DM limits", "Restrict DMs for minors to comply with COPPA")
+    assert result["classification"] == "REQUIRED"
+    assert result["confidence"] == 0.95
+    assert result["related_regulations"] == ["COPPA"]
+    assert result["input_feature_name"] == "Teen DM limits"
+
+
+def test_negated_mention_goes_to_llm():
+    assert fastpath_classify("Feature", "Complies with GDPR already; unrelated UI tweak") is None
+
+
+def test_bare_mention_goes_to_llm():
+    assert fastpath_classify("GDPR dashboard", "Shows export stats to the privacy team") is None
+
+
+def test_acronyms_are_case_sensitive():
+    assert fastpath_classify("Key rotation", "Required by policy: rotate the dsa signing keys") is None
+    result = fastpath_classify("Notice flow", "Add notice-and-action reporting required by the DSA")
+    assert result["related_regulations"] == ["EU Digital Services Act"]
+
+
+def test_phrases_match_case_insensitively():
+    result = fastpath_classify("Reporting", "Obligations under the digital services act for EU users")
+    assert result["classification"] == "REQUIRED"
+
+
+def test_no_regional_variation_is_not_required():
+    result = fastpath_classify("Dark mode", "Same behaviour everywhere, no regional variation")
+    assert result["classification"] == "NOT REQUIRED"
+    assert result["related_regulations"] == []
+
+
+def test_conflicting_labels_go_to_llm():
+    assert fastpath_classify("Feature", "To comply with GDPR; no regional variation") is None
+
+
+def test_region_name_alone_goes_to_llm():
+    assert fastpath_classify("Curfew", "Night-time curfew for users in California") is None
@@ -0,0 +1,35 @@
+import csv
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from src.utils.helpers import prefetch, read_csv_fast
+
+
+def _write_multiline_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["feature_name", "feature_description"])
+        for i in range(rows):
+            w.writerow([f"feature {i}", f"first line {i}\nsecond line, with a comma\nthird line"])
+
+
+def test_read_csv_fast_handles_multiline_cells_past_one_block(tmp_path):
+    path = tmp_path / "multiline.csv"
+    _write_multiline_csv(path, 25000)
+    assert path.stat().st_size > 1 << 20
+    df = read_csv_fast(path)
+    assert len(df) == 25000
+    assert df.loc[24999, "feature_description"] == "first line 24999\nsecond line, with a comma\nthird line"
+
+
+def test_prefetch_yields_in_order_and_reraises():
+    assert list(prefetch(range(5), depth=2)) == [0, 1, 2, 3, 4]
+
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        list(prefetch(failing()))
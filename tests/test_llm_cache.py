@@ -0,0 +1,95 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from src.cache import llm_cache
+from src.cache.llm_cache import LLMCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_exact_hit_and_miss(tmp_path):
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    cache.set({"q": 1}, {"classification": "REQUIRED"})
+    assert cache.get({"q": 1}) == {"classification": "REQUIRED"}
+    assert cache.get({"q": 2}) is None
+    assert cache.stats() == {"exact_hits": 1, "semantic_hits": 0, "misses": 1}
+
+
+def test_get_many_aligns_with_payloads(tmp_path):
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    cache.set_many([{"q": 1}, {"q": 3}], ["one", "three"])
+    assert cache.get_many([{"q": 1}, {"q": 2}, {"q": 3}, {"q": 1}]) == ["one", None, "three", "one"]
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=60)
+    cache.set({"q": 1}, "answer")
+    clock[0] += 59
+    assert cache.get({"q": 1}) == "answer"
+    clock[0] += 2
+    assert cache.get({"q": 1}) is None
+    assert cache.get_many([{"q": 1}]) == [None]
+
+
+def test_command_requests_bypass_the_cache(tmp_path):
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    cache.set({"q": 1}, "cached")
+    with llm_cache.request_intent(llm_cache.COMMAND):
+        assert cache.get({"q": 1}) is None
+        cache.set({"q": 2}, "fresh")
+    assert cache.get({"q": 2}) is None
+    assert cache.get({"q": 1}) == "cached"
+    assert cache.stats() == {"exact_hits": 1, "semantic_hits": 0, "misses": 1}
+
+
+def test_stats_are_flushed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "STATS_FLUSH_EVERY", 3)
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    for _ in range(2):
+        cache.get({"q": 1})
+    stored = dict(cache._conn.execute("SELECT name, value FROM stats").fetchall())
+    assert stored == {}
+    cache.get({"q": 1})
+    stored = dict(cache._conn.execute("SELECT name, value FROM stats").fetchall())
+    assert stored == {"misses": 3}
+
+
+def test_missing_semantic_deps_disable_tier_once(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    assert cache.get({"q": 1}, text="some feature") is None
+    assert cache._semantic is False
+    cache.set({"q": 1}, "answer", text="some feature")
+    assert cache.get({"q": 1}, text="some feature") == "answer"
+
+
+class StubEmbedder:
+    """Texts in the same group embed to the same unit vector."""
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        import numpy as np
+        vecs = np.zeros((len(texts), 4), dtype="float32")
+        for row, text in enumerate(texts):
+            vecs[row, self.groups[text]] = 1.0
+        return vecs
+
+
+def test_semantic_tier_hits_near_identical_text(tmp_path):
+    pytest.importorskip("numpy")
+    pytest.importorskip("faiss")
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_sec=None)
+    cache._embedder = StubEmbedder({"teen curfew": 0, "Teen curfew!": 0, "payments": 1})
+    cache.set({"q": "a"}, "stored", text="teen curfew")
+    assert cache.get({"q": "b"}, text="Teen curfew!") == "stored"
+    assert cache.get({"q": "c"}, text="payments") is None
+    assert cache.stats() == {"exact_hits": 0, "semantic_hits": 1, "misses": 1}
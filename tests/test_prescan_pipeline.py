@@ -0,0 +1,61 @@
+import csv
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from src.pipelines import prescan_pipeline
+from src.pipelines.prescan_pipeline import _iter_feature_columns, process_csv_with_prescan
+
+ROWS = 300
+
+
+@pytest.fixture
+def multiline_csv(tmp_path):
+    path = tmp_path / "features.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["feature_id", "feature_name", "feature_description"])
+        for i in range(ROWS):
+            w.writerow([i, f"Feature {i}", f"Age gate for teens, row {i}\nsecond line, quoted\nthird line"])
+    return path
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # many blocks per file, so quoted newlines straddle block boundaries
+    monkeypatch.setattr(prescan_pipeline, "PRESCAN_BLOCK_BYTES", 1 << 12)
+
+
+def test_streaming_reader_keeps_multiline_cells_whole(multiline_csv, small_blocks):
+    names, descs = [], []
+    blocks = 0
+    for n, d in _iter_feature_columns(multiline_csv):
+        names += n
+        descs += d
+        blocks += 1
+    assert blocks > 1
+    assert names == [f"Feature {i}" for i in range(ROWS)]
+    assert descs[-1] == f"Age gate for teens, row {ROWS - 1}\nsecond line, quoted\nthird line"
+
+
+def test_streaming_reader_reports_missing_column(tmp_path, small_blocks):
+    path = tmp_path / "bad.csv"
+    path.write_text("feature_name,other\na,b\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Missing required columns"):
+        list(_iter_feature_columns(path))
+
+
+def test_process_csv_with_prescan_streams_to_outputs(multiline_csv, small_blocks, tmp_path):
+    terms = tmp_path / "terms.json"
+    terms.write_text(json.dumps({"ASL": "Age Sensitive Logic"}), encoding="utf-8")
+    out_csv = tmp_path / "prescan.csv"
+    df = process_csv_with_prescan(multiline_csv, terms, out_csv, keep_results=True)
+    assert len(df) == ROWS
+    assert list(df["input_feature_name"]) == [f"Feature {i}" for i in range(ROWS)]
+    with open(out_csv, newline="", encoding="utf-8") as f:
+        written = list(csv.DictReader(f))
+    assert len(written) == ROWS
+    assert written[0]["input_feature_description"].count("\n") == 2
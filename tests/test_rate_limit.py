@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import rate_limit
+from src.utils.rate_limit import (
+    AIMDConcurrency, RateLimiter, TokenBucket, full_jitter_backoff,
+    is_rate_limit_error, is_server_error, retry_after_seconds,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def test_token_bucket_allows_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_token_bucket_refill_is_capped(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_token_bucket_rejects_bad_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_rate_limiter_waits_for_token_budget(clock):
+    limiter = RateLimiter(rpm=600, tpm=600)
+    limiter.acquire(estimated_tokens=400)
+    assert clock.sleeps == []
+    limiter.acquire(estimated_tokens=400)
+    # 200 tokens short at 10 tokens/s
+    assert sum(clock.sleeps) == pytest.approx(20.0)
+
+
+def test_rate_limiter_penalize_drains_capacity(clock):
+    limiter = RateLimiter(rpm=60)
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.penalize()
+    limiter.acquire()
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_aimd_grows_under_target_and_cuts_on_throttle(clock):
+    gate = AIMDConcurrency(c_min=2, c_max=4, alpha=1.0, beta=0.5, window=4,
+                           target_latency=1.0, cooldown_sec=10.0)
+    for _ in range(3):
+        gate.acquire()
+        gate.release(latency=0.5)
+    assert gate.limit == 4
+    gate.acquire()
+    gate.release(latency=0.5, throttled=True)
+    assert gate.limit == 2
+    assert gate._open_until == pytest.approx(clock.now + 10.0)
+    clock.now += 10.0
+    gate.acquire()
+    assert gate._in_flight == 1
+
+
+def test_aimd_shrinks_when_latency_exceeds_target(clock):
+    gate = AIMDConcurrency(c_min=1, c_max=8, alpha=1.0, beta=0.5, target_latency=1.0)
+    gate.limit = 8.0
+    gate.acquire()
+    gate.release(latency=5.0)
+    assert gate.limit == 4.0
+
+
+def test_aimd_derives_target_from_first_window(clock):
+    gate = AIMDConcurrency(c_min=1, c_max=8, window=3)
+    for latency in (1.0, 2.0, 3.0):
+        gate.acquire()
+        gate.release(latency=latency)
+    assert gate.target_latency == pytest.approx(3.0)
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_rate_limit_detection_uses_status_not_message():
+    assert is_rate_limit_error(ResourceExhausted("quota"))
+    coded = Exception("throttled")
+    coded.code = 429
+    assert is_rate_limit_error(coded)
+    assert not is_rate_limit_error(ValueError("row 429 failed to parse"))
+
+
+def test_server_error_detection():
+    err = Exception("bad gateway")
+    err.response = SimpleNamespace(status_code=503, headers={})
+    assert is_server_error(err)
+    assert not is_server_error(ValueError("500 rows"))
+
+
+def test_retry_after_hints():
+    err = Exception("slow down")
+    err.response = SimpleNamespace(headers={"Retry-After": "7"})
+    assert retry_after_seconds(err) == 7.0
+    assert retry_after_seconds(Exception("Please retry in 12.5s")) == 12.5
+    assert retry_after_seconds(Exception("nope")) is None
+
+
+def test_full_jitter_backoff_bounds():
+    for attempt in range(8):
+        assert 0.0 <= full_jitter_backoff(attempt, base=1.0, cap=30.0) <= min(30.0, 2 ** attempt)